@@ -0,0 +1,161 @@
+# attempt_writer.py
+import asyncio
+import random
+from datetime import datetime
+
+from database import get_async_session
+from models import AttemptsOrm, ResponsesOrm
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+# Промежуточное сохранение ответов, секунд. Интервал каждого клиента
+# сдвигается случайно, чтобы аудитория не писала в БД одновременно
+CHECKPOINT_INTERVAL = 60
+CHECKPOINT_JITTER = 0.2
+
+# Записи, которые идут в фоне (окно теста уже закрыто). Точки входа
+# дожидаются их перед закрытием соединений с БД
+_pending_flushes = set()
+
+
+def _track(coro):
+    task = asyncio.ensure_future(coro)
+    _pending_flushes.add(task)
+    task.add_done_callback(_pending_flushes.discard)
+    return task
+
+
+async def wait_pending_flushes():
+    """Дождаться фоновых записей ответов (до close_databases())"""
+    while _pending_flushes:
+        results = await asyncio.gather(
+            *_pending_flushes, return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"❌ Не удалось сохранить ответы: {result}")
+        # Завершённые задачи уже убраны из множества, новые — дождёмся
+        await asyncio.sleep(0)
+
+
+class AttemptWriter:
+    """
+    Ответы одной попытки прохождения теста. Ответы копятся в памяти и
+    пишутся в БД одной пачкой: при завершении теста и периодически
+    (контрольная точка), а не по запросу на каждый ответ.
+    """
+
+    def __init__(self, student_id, test_id, test_version, question_count):
+        self.student_id = student_id
+        self.test_id = test_id
+        self.test_version = test_version
+        self.question_count = question_count
+        self.attempt_id = None  # появляется при первой записи в БД
+        self.correct_count = 0
+        self.finished = False
+        self._pending = []
+        self._lock = asyncio.Lock()
+        self._checkpoint_task = None
+
+    def record(self, question_type, question_id, answer, is_correct):
+        """Ответ на вопрос (только в памяти)"""
+        self._pending.append(
+            {
+                "question_type": question_type,
+                "question_id": question_id,
+                "answer": answer,
+                "is_correct": is_correct,
+                "answered_at": datetime.now(),
+            }
+        )
+        if is_correct:
+            self.correct_count += 1
+
+    @property
+    def has_pending(self):
+        return bool(self._pending)
+
+    def start_checkpoints(self, interval=CHECKPOINT_INTERVAL):
+        """Периодическое сохранение накопленных ответов"""
+        if self._checkpoint_task is None:
+            self._checkpoint_task = asyncio.ensure_future(
+                self._checkpoints(interval)
+            )
+
+    def stop_checkpoints(self):
+        if self._checkpoint_task is not None:
+            self._checkpoint_task.cancel()
+            self._checkpoint_task = None
+
+    async def _checkpoints(self, interval):
+        while True:
+            jitter = 1 + random.uniform(-CHECKPOINT_JITTER, CHECKPOINT_JITTER)
+            await asyncio.sleep(interval * jitter)
+            if not self._pending:
+                continue
+            try:
+                await self.flush()
+            except Exception as e:
+                # Ответы остались в буфере, попробуем в следующий раз
+                print(f"⚠️  Не удалось сохранить ответы: {e}")
+
+    async def finish(self):
+        """Завершение попытки: последняя пачка ответов и итог"""
+        self.stop_checkpoints()
+        self.finished = True
+        await _track(self.flush())
+
+    def flush_in_background(self):
+        """Запись без ожидания (окно закрывается), см. wait_pending_flushes"""
+        return _track(self.flush())
+
+    async def flush(self):
+        """
+        Запись накопленных ответов одной транзакцией: попытка (при первой
+        записи), все ответы одним INSERT и текущий счёт. При ошибке ответы
+        возвращаются в буфер.
+        """
+        async with self._lock:
+            rows, self._pending = self._pending, []
+            if not rows and self.attempt_id is not None and not self.finished:
+                return
+            try:
+                async with get_async_session() as session:
+                    attempt_id = await self._write(session, rows)
+                    await session.commit()
+            except BaseException:
+                self._pending = rows + self._pending
+                raise
+            self.attempt_id = attempt_id
+
+    async def _write(self, session, rows):
+        attempt_id = self.attempt_id
+        if attempt_id is None:
+            attempt_id = await session.scalar(
+                insert(AttemptsOrm)
+                .values(
+                    student_id=self.student_id,
+                    test_id=self.test_id,
+                    test_version=self.test_version,
+                    question_count=self.question_count,
+                )
+                .returning(AttemptsOrm.id)
+            )
+
+        if rows:
+            await session.execute(
+                pg_insert(ResponsesOrm).on_conflict_do_nothing(
+                    constraint="uq_responses_attempt_question"
+                ),
+                [dict(row, attempt_id=attempt_id) for row in rows],
+            )
+
+        values = {"correct_count": self.correct_count}
+        if self.finished:
+            values["finished_at"] = datetime.now()
+        await session.execute(
+            update(AttemptsOrm)
+            .where(AttemptsOrm.id == attempt_id)
+            .values(**values)
+        )
+        return attempt_id
@@ -0,0 +1,169 @@
+# auth.py
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from functools import lru_cache
+from typing import NamedTuple
+
+from database import get_async_session
+from models import StudentsOrm, TeachersOrm
+from sqlalchemy import literal, select, union_all, update
+
+# Пароли хранятся как pbkdf2_sha256$<итерации>$<соль>$<хэш> (base64).
+# Проверка намеренно дорогая (~0.1-0.2 с), поэтому выполняется в потоке
+HASH_ALGORITHM = "pbkdf2_sha256"
+HASH_ITERATIONS = 200000
+SALT_BYTES = 16
+
+# Сгенерированные пароли студентов — 8 случайных символов из 62 (~47 бит):
+# перебор по утёкшему хэшу невозможен и без дорогого растяжения, поэтому
+# для них берётся дешёвая стоимость, чтобы импорт тысяч студентов занимал
+# секунды. Дорогой хэш остаётся для паролей, придуманных человеком
+GENERATED_PASSWORD_ITERATIONS = 1000
+
+TEACHER = "teacher"
+STUDENT = "student"
+
+
+class Principal(NamedTuple):
+    """Вошедший пользователь"""
+
+    role: str
+    id: int
+
+    @property
+    def is_teacher(self):
+        return self.role == TEACHER
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def hash_password(password, iterations=HASH_ITERATIONS):
+    """Хэш пароля со случайной солью в формате для хранения в БД"""
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _pbkdf2(password, salt, iterations)
+    return "$".join(
+        (HASH_ALGORITHM, str(iterations), _b64(salt), _b64(digest))
+    )
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_ALGORITHM + "$")
+
+
+def verify_password(password, stored):
+    """
+    Проверка пароля, возвращает (подходит, нужно_перехэшировать).
+    Пароли, сохранённые до введения хэшей, хранятся открытым текстом —
+    после успешного входа их нужно заменить хэшем.
+    """
+    if not is_hashed(stored):
+        ok = hmac.compare_digest(password.encode(), stored.encode())
+        return ok, ok
+
+    _, iterations, salt, expected = stored.split("$")
+    digest = _pbkdf2(password, base64.b64decode(salt), int(iterations))
+    ok = hmac.compare_digest(digest, base64.b64decode(expected))
+    return ok, ok and int(iterations) < GENERATED_PASSWORD_ITERATIONS
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash():
+    return hash_password(secrets.token_hex(8))
+
+
+def _verify_unknown_login(password):
+    """Такая же по времени проверка для несуществующего логина"""
+    verify_password(password, _dummy_hash())
+    return False, False
+
+
+def _hash_many(passwords, iterations):
+    return [hash_password(password, iterations) for password in passwords]
+
+
+async def hash_passwords(passwords, iterations=HASH_ITERATIONS):
+    """
+    Хэши паролей в потоках (pbkdf2_hmac отпускает GIL): список делится
+    на столько частей, сколько ядер, а не на задачу на каждый пароль
+    """
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    loop = asyncio.get_running_loop()
+    size = -(-len(passwords) // (os.cpu_count() or 1))
+    chunks = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                None, _hash_many, passwords[start : start + size], iterations
+            )
+            for start in range(0, len(passwords), size)
+        )
+    )
+    return [stored for chunk in chunks for stored in chunk]
+
+
+def principal_query(login):
+    """Учитель и студент с таким логином — одним запросом по индексам"""
+    return union_all(
+        select(
+            literal(TEACHER).label("role"),
+            TeachersOrm.id,
+            TeachersOrm.password,
+        ).where(TeachersOrm.login == login),
+        select(
+            literal(STUDENT).label("role"),
+            StudentsOrm.id,
+            StudentsOrm.password,
+        ).where(StudentsOrm.login == login),
+    )
+
+
+async def authenticate(login, password):
+    """Principal вошедшего пользователя или None"""
+    async with get_async_session() as session:
+        rows = (await session.execute(principal_query(login))).all()
+
+    loop = asyncio.get_running_loop()
+    if not rows:
+        await loop.run_in_executor(None, _verify_unknown_login, password)
+        return None
+
+    # Учитель проверяется первым, как и раньше
+    rows.sort(key=lambda row: row.role != TEACHER)
+    for row in rows:
+        ok, needs_rehash = await loop.run_in_executor(
+            None, verify_password, password, row.password
+        )
+        if not ok:
+            continue
+        if needs_rehash:
+            await upgrade_password(row.role, row.id, password)
+        return Principal(row.role, row.id)
+    return None
+
+
+async def upgrade_password(role, principal_id, password):
+    """Замена старого пароля (открытый текст) хэшем после входа"""
+    model = TeachersOrm if role == TEACHER else StudentsOrm
+    try:
+        (stored,) = await hash_passwords([password])
+        async with get_async_session() as session:
+            await session.execute(
+                update(model)
+                .where(model.id == principal_id)
+                .values(password=stored)
+            )
+            await session.commit()
+    except Exception as e:
+        # Вход не блокируем: пароль перехэшируется при следующем входе
+        print(f"⚠️  Не удалось обновить хэш пароля: {e}")
@@ -0,0 +1,555 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import event, select, text
+
+sys.path.append(os.path.dirname(__file__))
+
+# Бюджет на импорт модулей до появления окна входа
+STARTUP_IMPORT_BUDGET_MS = 500
+
+# Модули, которые не должны загружаться до открытия окна входа
+LAZY_MODULES = ("pandas", "openpyxl", "sqlalchemy.ext.asyncio", "asyncpg")
+
+
+class StatementCounter:
+    """Подсчёт SQL-запросов, выполненных через engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def bench_open_test(session_factory, engine, test_id, students=30):
+    """
+    Открытие одного теста группой студентов: выборка в БД, вопросы —
+    из кэша процесса, если их уже загружали
+    """
+    from payload_cache import payload_cache
+    from repository import _load_exam_sample
+
+    payload_cache.invalidate(test_id)
+    with StatementCounter(engine) as counter:
+        start = time.perf_counter()
+        for _ in range(students):
+            with session_factory() as session:
+                _, payload = _load_exam_sample(session, test_id)
+        elapsed = time.perf_counter() - start
+
+    stats = payload_cache.stats()
+    print(
+        f"📊 Открытие теста {test_id}: {students} студентов, "
+        f"{len(payload.questions)} вопросов в выборке, "
+        f"{counter.count} запросов к БД, {elapsed * 1000:.1f} мс, "
+        f"кэш вопросов: {stats['hits']} попаданий / {stats['misses']} промахов"
+    )
+    return counter.count
+
+
+def bench_editor_load(session_factory, engine, test_id):
+    """
+    Открытие теста в редакторе: список вопросов (без HTML) одним
+    запросом и один запрос на открываемый вопрос
+    """
+    from question_loader import load_question_entry, load_question_summaries
+
+    with StatementCounter(engine) as counter:
+        start = time.perf_counter()
+        with session_factory() as session:
+            summaries = load_question_summaries(session, test_id)
+            if summaries:
+                load_question_entry(session, test_id, summaries[0].key)
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"📊 Редактор, тест {test_id}: {len(summaries)} вопросов в списке, "
+        f"{counter.count} запросов к БД, {elapsed * 1000:.1f} мс"
+    )
+    if counter.count > 2:
+        print("❌ Открытие теста в редакторе делает больше двух запросов")
+    return counter.count
+
+
+def synthetic_questions(count):
+    """Вопросы в формате QuestionEditor.questions: (html, type, answer, tag)"""
+    questions = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            questions.append(
+                (f"<p>Вопрос {i}</p>", "Ввод строки", "ответ", None)
+            )
+        elif kind == 1:
+            questions.append(
+                (
+                    f"<p>Вопрос {i}</p>",
+                    "Выбор правильн(ого/ых) ответов",
+                    [["верно"], ["неверно 1", "неверно 2", "неверно 3"]],
+                    "Тег",
+                )
+            )
+        else:
+            questions.append(
+                (
+                    f"<p>Вопрос {i}</p>",
+                    "Упорядочивание",
+                    ["первый", "второй", "третий", "четвёртый"],
+                    "Тег",
+                )
+            )
+    return questions
+
+
+def bench_bulk_save(session_factory, engine, count=500):
+    """Сохранение теста из count вопросов (транзакция откатывается)"""
+    from models import TestsOrm
+    from question_saver import insert_questions, insert_tags
+
+    questions = synthetic_questions(count)
+
+    with session_factory() as session:
+        test = TestsOrm(
+            name_test=f"benchmark_{time.time()}", teacher="bench"
+        )
+        session.add(test)
+        session.flush()
+
+        with StatementCounter(engine) as counter:
+            start = time.perf_counter()
+            tag_ids = insert_tags(
+                session, test.id, {"Без тэга": 1, "Тег": 1}
+            )
+            insert_questions(session, test.id, questions, tag_ids)
+            session.flush()
+            elapsed = time.perf_counter() - start
+
+        session.rollback()
+
+    print(
+        f"📊 Сохранение теста: {count} вопросов, "
+        f"{counter.count} запросов к БД, {elapsed * 1000:.1f} мс"
+    )
+    return elapsed
+
+
+def bench_student_import(session_factory, engine, count=5000):
+    """
+    Импорт count студентов (транзакция откатывается): генерация логинов,
+    хэширование паролей и запись в БД — должно занимать секунды
+    """
+    from auth import GENERATED_PASSWORD_ITERATIONS, hash_passwords
+    from student_import import import_students, unique_credentials
+
+    rows = [(f"Студент {i}", f"benchmark_{i % 10}") for i in range(count)]
+
+    with session_factory() as session:
+        with StatementCounter(engine) as counter:
+            start = time.perf_counter()
+            credentials = unique_credentials(session, count)
+
+            hash_start = time.perf_counter()
+            stored = asyncio.run(
+                hash_passwords(
+                    [password for _, password in credentials],
+                    GENERATED_PASSWORD_ITERATIONS,
+                )
+            )
+            hash_elapsed = time.perf_counter() - hash_start
+
+            import_students(
+                session,
+                rows,
+                [
+                    (login, password, stored_password)
+                    for (login, password), stored_password in zip(
+                        credentials, stored
+                    )
+                ],
+            )
+            session.flush()
+            elapsed = time.perf_counter() - start
+
+        session.rollback()
+
+    print(
+        f"📊 Импорт студентов: {count} за {elapsed:.2f} с "
+        f"(хэширование паролей {hash_elapsed:.2f} с), "
+        f"{counter.count} запросов к БД"
+    )
+    return elapsed
+
+
+def app_queries(test_id, group_id, question_key):
+    """
+    Запросы приложения, которые должны идти по индексам, — из тех же
+    функций, что строят их в приложении
+    """
+    from auth import principal_query
+    from credential_export import export_students_query, reset_students_query
+    from image_store import images_query
+    from question_loader import (
+        build_payload_query,
+        build_question_query,
+        build_questions_query,
+        build_sample_keys_query,
+        build_summaries_query,
+    )
+    from repository import group_students_query
+
+    return {
+        "вход": principal_query("teacher_admin"),
+        "студенты группы": group_students_query(group_id),
+        "экспорт логинов группы": export_students_query(group_id),
+        "сброс паролей групп": reset_students_query([group_id]),
+        "изображения вопросов": images_query(["0" * 64]),
+        "загрузка теста": build_payload_query(test_id),
+        "выборка вопросов по тегам": build_sample_keys_query(test_id),
+        "вопросы выборки": build_questions_query(test_id, [question_key]),
+        "список вопросов редактора": build_summaries_query(test_id),
+        "вопрос редактора": build_question_query(test_id, question_key),
+    }
+
+
+def plan_fixture(session):
+    """
+    Строки, по которым строятся планы: группа со студентом и тест с тегом
+    и вопросом каждого типа. Создаются в транзакции проверки и
+    откатываются вместе с ней, поэтому проверка не зависит от данных в БД.
+    Возвращает (test_id, group_id, ключ вопроса).
+    """
+    from models import (
+        AnswersCheckBoxOrm,
+        AnswersReplacementOrm,
+        GroupsOrm,
+        QuestionsCheckBoxOrm,
+        QuestionsInputStringOrm,
+        QuestionsReplacementOrm,
+        StudentsOrm,
+        TagsOrm,
+        TestsOrm,
+    )
+    from question_loader import CHECK_BOX
+
+    group = GroupsOrm(name="__plan_check__")
+    test = TestsOrm(name_test="__plan_check__", teacher="plan check")
+    session.add_all([group, test])
+    session.flush()
+
+    tag = TagsOrm(name="plan check", count=1, test_id=test.id)
+    session.add(tag)
+    session.flush()
+
+    checkbox = QuestionsCheckBoxOrm(
+        question="<p>?</p>", test_id=test.id, tag_id=tag.id
+    )
+    replacement = QuestionsReplacementOrm(
+        question="<p>?</p>", test_id=test.id, tag_id=tag.id
+    )
+    session.add_all(
+        [
+            checkbox,
+            replacement,
+            QuestionsInputStringOrm(
+                question="<p>?</p>",
+                answers="ответ",
+                test_id=test.id,
+                tag_id=tag.id,
+            ),
+            StudentsOrm(
+                login="__plan_check__",
+                password="-",
+                full_name="plan check",
+                group_id=group.id,
+            ),
+        ]
+    )
+    session.flush()
+
+    session.add_all(
+        [
+            AnswersCheckBoxOrm(
+                text="a", is_correct=True, question_id=checkbox.id
+            ),
+            AnswersReplacementOrm(
+                text="a", number_in_answer=1, question_id=replacement.id
+            ),
+        ]
+    )
+    session.flush()
+    return test.id, group.id, (CHECK_BOX, checkbox.id)
+
+
+def check_query_plans(session_factory, engine):
+    """
+    EXPLAIN запросов приложения. Последовательное сканирование запрещено
+    (enable_seqscan = off), поэтому Seq Scan в плане означает, что
+    подходящего индекса нет — даже на маленьких тестовых данных.
+    Возвращает названия запросов с Seq Scan.
+    """
+    failed = []
+    with session_factory() as session:
+        test_id, group_id, question_key = plan_fixture(session)
+
+        session.execute(text("SET LOCAL enable_seqscan = off"))
+        queries = app_queries(test_id, group_id, question_key)
+        for name, stmt in queries.items():
+            sql = stmt.compile(
+                dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+            )
+            plan = "\n".join(
+                session.scalars(text(f"EXPLAIN {sql}")).all()
+            )
+            if "Seq Scan" in plan:
+                failed.append(name)
+                print(f"❌ {name}: последовательное сканирование\n{plan}")
+            else:
+                print(f"✅ {name}")
+        session.rollback()
+    return failed
+
+
+def profile_startup_imports(module="login_window", top=15):
+    """
+    Профиль импорта (python -X importtime) модуля с окном входа:
+    общее время, самые медленные модули и загруженные раньше времени
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(f"❌ Не удалось импортировать {module}:\n{result.stderr}")
+        return None
+
+    # Строки вида "import time:   self [us] | cumulative | imported package"
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[12:].split("|")
+        if not self_us.strip().isdigit():
+            continue  # заголовок
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+
+    total_ms = timings[module][1] / 1000
+    print(f"📊 Импорт {module}: {total_ms:.0f} мс, модулей: {len(timings)}")
+    slowest = sorted(timings.items(), key=lambda item: -item[1][0])[:top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(
+            f"   {self_us / 1000:7.1f} мс  "
+            f"(вместе с зависимостями {cumulative_us / 1000:7.1f} мс)  {name}"
+        )
+
+    for name in LAZY_MODULES:
+        if name in timings:
+            print(f"❌ {name} загружается до открытия окна входа")
+    if total_ms > STARTUP_IMPORT_BUDGET_MS:
+        print(f"❌ Импорт дольше {STARTUP_IMPORT_BUDGET_MS} мс")
+    else:
+        print(f"✅ Импорт укладывается в {STARTUP_IMPORT_BUDGET_MS} мс")
+    return total_ms
+
+
+def bench_config_load():
+    """Загрузка настроек: полный PBKDF2 против ключа из локального кэша"""
+    from config import derive_key, init_settings
+
+    start = time.perf_counter()
+    derive_key("benchmark")
+    derive_ms = (time.perf_counter() - start) * 1000
+
+    init_settings()  # первый запуск сохраняет ключ в кэш
+    start = time.perf_counter()
+    init_settings()
+    cached_ms = (time.perf_counter() - start) * 1000
+
+    print(
+        f"📊 Настройки: PBKDF2 {derive_ms:.0f} мс, "
+        f"загрузка с кэшированным ключом {cached_ms:.0f} мс"
+    )
+
+
+def bench_grading(responses=100_000, questions=300):
+    """
+    Проверка ответов без интерфейса и БД: компиляция проверок вопросов
+    и пакетная перепроверка responses синтетических ответов
+    """
+    import random
+
+    from grading import compile_graders, regrade
+    from question_loader import (
+        CHECK_BOX,
+        INPUT_STRING,
+        REPLACEMENT,
+        AnswerRecord,
+        QuestionRecord,
+        TestPayload,
+    )
+
+    rng = random.Random(0)
+    records = []
+    for i in range(questions):
+        q_type = (INPUT_STRING, CHECK_BOX, REPLACEMENT)[i % 3]
+        options = tuple(
+            AnswerRecord(
+                id=i * 10 + j,
+                text=f"Вариант {j}",
+                is_correct=j % 2 == 0,
+                number_in_answer=j + 1,
+            )
+            for j in range(5)
+        )
+        records.append(
+            QuestionRecord(
+                id=i,
+                type=q_type,
+                question="",
+                tag_id=None,
+                tag_name=None,
+                answer=(
+                    '["Ответ", "Другой  ответ"]'
+                    if q_type == INPUT_STRING
+                    else None
+                ),
+                answers=options if q_type != INPUT_STRING else (),
+            )
+        )
+    payload = TestPayload(test_id=0, questions=tuple(records), tags=())
+
+    batch = []
+    for _ in range(responses):
+        q = rng.choice(records)
+        if q.type == INPUT_STRING:
+            answer = rng.choice(["ответ", "  ДРУГОЙ   ответ ", "нет"])
+        elif q.type == CHECK_BOX:
+            answer = [a.id for a in q.answers if rng.random() < 0.5]
+        else:
+            answer = [a.id for a in q.answers]
+            if rng.random() < 0.5:
+                rng.shuffle(answer)
+        batch.append((q.type, q.id, answer))
+
+    start = time.perf_counter()
+    graders = compile_graders(payload)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    results = regrade(graders, batch)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"📊 Проверка ответов: {questions} вопросов за {compile_ms:.1f} мс, "
+        f"{responses} ответов за {elapsed * 1000:.0f} мс "
+        f"({elapsed / responses * 1e6:.2f} мкс на ответ, "
+        f"верных {sum(results)})"
+    )
+    return elapsed
+
+
+async def bench_pool(concurrent=20):
+    """
+    Параллельные запросы окон приложения через общий пул: соединений
+    к серверу должно открыться не больше DB_POOL_SIZE + DB_MAX_OVERFLOW
+    """
+    from database import close_databases, connection_manager, init_databases
+    from query_stats import query_stats
+    from repository import list_tests
+
+    init_databases()
+    start = time.perf_counter()
+    await asyncio.gather(*(list_tests() for _ in range(concurrent)))
+    elapsed = time.perf_counter() - start
+
+    stats = connection_manager.stats()
+    print(
+        f"📊 {concurrent} параллельных запросов: {elapsed * 1000:.0f} мс, "
+        f"соединений открыто {stats['connects']}, "
+        f"одновременно занято до {stats['max_checked_out']}"
+    )
+    query_stats.report(top=5)
+    await close_databases()
+
+
+def main():
+    print("🔍 Профиль импорта при запуске...")
+    profile_startup_imports()
+    bench_config_load()
+    bench_grading()
+
+    from config import init_settings
+    from models import TestsOrm
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    print("🔍 Пул соединений приложения...")
+    asyncio.run(bench_pool())
+
+    # Замеры запросов — через отдельный синхронный engine скрипта
+    engine = create_engine(init_settings().DATABASE_URL_psycopg)
+    session_factory = sessionmaker(engine, expire_on_commit=False)
+
+    with session_factory() as session:
+        test_ids = session.scalars(select(TestsOrm.id)).all()
+
+    print("🔍 Замеры загрузки тестов...")
+    if not test_ids:
+        print("⚠️  В базе нет тестов для замеров")
+    for test_id in test_ids:
+        bench_open_test(session_factory, engine, test_id)
+        bench_editor_load(session_factory, engine, test_id)
+
+    print("🔍 Замеры сохранения тестов...")
+    bench_bulk_save(session_factory, engine)
+
+    print("🔍 Замеры импорта студентов...")
+    bench_student_import(session_factory, engine)
+
+    print("🔍 Проверка планов запросов...")
+    failed = check_query_plans(session_factory, engine)
+
+    engine.dispose()
+
+    if failed:
+        print(f"❌ Запросы без индекса: {', '.join(failed)}")
+        sys.exit(1)
+
+
+def run_plan_check():
+    """
+    Только проверка планов запросов (вызывается при сборке):
+    True, если все запросы идут по индексам
+    """
+    from config import init_settings
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(init_settings().DATABASE_URL_psycopg)
+    try:
+        failed = check_query_plans(sessionmaker(engine), engine)
+    finally:
+        engine.dispose()
+
+    if failed:
+        print(f"❌ Запросы без индекса: {', '.join(failed)}")
+    return not failed
+
+
+if __name__ == "__main__":
+    if "--plans" in sys.argv:
+        sys.exit(0 if run_plan_check() else 1)
+    main()
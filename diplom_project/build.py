@@ -18,6 +18,15 @@ def build_installer():
         print("❌ Ошибка при шифровании конфигурации")
         return
 
+    # Запросы приложения должны идти по индексам (EXPLAIN на тестовых
+    # строках, которые откатываются); без этого сборку не выпускаем
+    print("🔍 Проверяем планы запросов...")
+    from benchmark import run_plan_check
+
+    if not run_plan_check():
+        print("❌ Есть запросы без индекса, сборка остановлена")
+        return
+
     # 2. Сначала соберем отладочную версию
     print("🐛 Собираем отладочную версию...")
     PyInstaller.__main__.run(
@@ -31,6 +40,19 @@ def build_installer():
             '--add-data=database.py;.',
             '--add-data=models.py;.',
             '--add-data=login_window.py;.',
+            '--add-data=question_loader.py;.',
+            '--add-data=payload_cache.py;.',
+            '--add-data=question_saver.py;.',
+            '--add-data=student_import.py;.',
+            '--add-data=credential_export.py;.',
+            '--add-data=image_store.py;.',
+            '--add-data=migrations.py;.',
+            '--add-data=demo_data.py;.',
+            '--add-data=repository.py;.',
+            '--add-data=query_stats.py;.',
+            '--add-data=attempt_writer.py;.',
+            '--add-data=auth.py;.',
+            '--add-data=grading.py;.',
             '--hidden-import=sqlalchemy',
             '--hidden-import=sqlalchemy.ext.asyncio',
             '--hidden-import=sqlalchemy.orm',
@@ -65,6 +87,19 @@ def build_installer():
             '--add-data=database.py;.',
             '--add-data=models.py;.',
             '--add-data=login_window.py;.',
+            '--add-data=question_loader.py;.',
+            '--add-data=payload_cache.py;.',
+            '--add-data=question_saver.py;.',
+            '--add-data=student_import.py;.',
+            '--add-data=credential_export.py;.',
+            '--add-data=image_store.py;.',
+            '--add-data=migrations.py;.',
+            '--add-data=demo_data.py;.',
+            '--add-data=repository.py;.',
+            '--add-data=query_stats.py;.',
+            '--add-data=attempt_writer.py;.',
+            '--add-data=auth.py;.',
+            '--add-data=grading.py;.',
             '--hidden-import=sqlalchemy',
             '--hidden-import=sqlalchemy.ext.asyncio',
             '--hidden-import=sqlalchemy.orm',
@@ -1,13 +1,143 @@
 # config.py
 import base64
+import io
 import os
+import stat
 import sys
-import tempfile
+from contextvars import ContextVar
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from dotenv import dotenv_values
+from pydantic_settings import (
+    BaseSettings,
+    PydanticBaseSettingsSource,
+    SettingsConfigDict,
+)
+
+KDF_SALT = b'salt_'  # Фиксированная соль для простоты
+KDF_ITERATIONS = 100000
+
+# Кэш ключа равносилен паролю: кто может прочитать файл, тот
+# расшифрует конфигурацию. Поэтому ключ лежит не рядом с
+# config_encrypted.dat, а в локальном каталоге пользователя с правами
+# только для владельца (на Windows — под ACL профиля LOCALAPPDATA).
+# Это компромисс ради быстрого запуска: на общих учётных записях кэш
+# отключается переменной окружения TEST_CENTER_NO_KEY_CACHE=1
+KEY_CACHE_FILE = "config.key"
+KEY_CACHE_DISABLE_ENV = "TEST_CENTER_NO_KEY_CACHE"
+
+
+def derive_key(password, salt=KDF_SALT, iterations=KDF_ITERATIONS):
+    """Ключ Fernet из пароля (PBKDF2-HMAC-SHA256, ~сотни мс)"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(password.encode()))
+
+
+def key_cache_path():
+    """Файл с ключом в локальном каталоге пользователя"""
+    if sys.platform == "win32":
+        base_dir = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(
+            "~/.cache"
+        )
+    return os.path.join(base_dir, "test_center", KEY_CACHE_FILE)
+
+
+def key_cache_enabled():
+    return os.environ.get(KEY_CACHE_DISABLE_ENV, "") not in ("1", "true")
+
+
+def restrict_permissions(path):
+    """Права 0600: O_CREAT не меняет права уже существующего файла"""
+    if sys.platform != "win32":
+        os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+
+
+def read_cached_key():
+    if not key_cache_enabled():
+        return None
+    path = key_cache_path()
+    try:
+        # Файл, доступный другим пользователям, сначала закрываем
+        if os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            restrict_permissions(path)
+        with open(path, 'rb') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_cached_key(key):
+    """Сохранение ключа с правами только для владельца (0600)"""
+    if not key_cache_enabled():
+        return
+    path = key_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        restrict_permissions(path)
+    except OSError as e:
+        # Без кэша всё работает, просто каждый запуск считает ключ заново
+        print(f"⚠️  Не удалось сохранить ключ конфигурации: {e}")
+
+
+def decrypt_config(encrypted_data, password):
+    """
+    Расшифровка конфигурации. Ключ берётся из локального кэша, PBKDF2
+    выполняется только при первом запуске или если ключ не подошёл
+    (сменился пароль или файл конфигурации).
+    """
+    key = read_cached_key()
+    if key is not None:
+        try:
+            return Fernet(key).decrypt(encrypted_data)
+        except (InvalidToken, ValueError):
+            pass
+
+    key = derive_key(password)
+    decrypted_data = Fernet(key).decrypt(encrypted_data)
+    write_cached_key(key)
+    return decrypted_data
+
+
+# Расшифрованный .env на время создания Settings.from_encrypted_file
+_decrypted_env = ContextVar("decrypted_env", default=None)
+
+
+class DecryptedEnvSource(PydanticBaseSettingsSource):
+    """
+    Расшифрованный .env в памяти вместо .env-файла — с тем же
+    приоритетом: переменные окружения важнее (DB_HOST=... python main.py)
+    """
+
+    def __init__(self, settings_cls, values):
+        super().__init__(settings_cls)
+        self.values = {
+            name.upper(): value
+            for name, value in values.items()
+            if value is not None
+        }
+
+    def get_field_value(self, field, field_name):
+        return self.values.get(field_name.upper()), field_name, False
+
+    def __call__(self):
+        data = {}
+        for field_name, field in self.settings_cls.model_fields.items():
+            value, key, _ = self.get_field_value(field, field_name)
+            if value is not None:
+                data[key] = value
+        return data
 
 
 class Settings(BaseSettings):
@@ -17,42 +147,41 @@ class Settings(BaseSettings):
     DB_PASS: str
     DB_NAME: str
 
+    # Пул соединений на один клиент. Настольному приложению хватает
+    # одного-двух соединений: при 40 клиентах это 80-160 соединений
+    # к серверу, а не тысячи. 0 — без пула на клиенте (NullPool)
+    DB_POOL_SIZE: int = 2
+    DB_MAX_OVERFLOW: int = 2
+    DB_POOL_TIMEOUT: int = 30  # секунд ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800  # пересоздавать соединения раз в 30 минут
+
+    # Подключение через PgBouncer в режиме pool_mode=transaction:
+    # кэш подготовленных запросов asyncpg отключается, имена запросов
+    # уникальны. Вместе с ним обычно задают DB_POOL_SIZE=0
+    DB_PGBOUNCER: bool = False
+
+    # Запросы дольше этого порога попадают в журнал как медленные
+    DB_SLOW_QUERY_MS: int = 200
+    # Файл журнала всех SQL-запросов (пусто — не писать)
+    DB_QUERY_LOG: str = ""
+
     @classmethod
     def from_encrypted_file(cls, encrypted_file_path, password):
         """Загрузка настроек из зашифрованного файла"""
         try:
-            # Генерация ключа из пароля
-            password_bytes = password.encode()
-            salt = b'salt_'  # Фиксированная соль для простоты
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(password_bytes))
-
             # Чтение и расшифровка
             with open(encrypted_file_path, 'rb') as f:
                 encrypted_data = f.read()
 
-            fernet = Fernet(key)
-            decrypted_data = fernet.decrypt(encrypted_data)
-
-            # Создание временного файла с настройками
-            with tempfile.NamedTemporaryFile(
-                mode='w', delete=False, suffix='.env'
-            ) as f:
-                f.write(decrypted_data.decode())
-                temp_env_file = f.name
+            decrypted_data = decrypt_config(encrypted_data, password)
 
-            # Загрузка настроек
-            settings = cls(_env_file=temp_env_file)
-
-            # Удаление временного файла
-            os.unlink(temp_env_file)
-
-            return settings
+            # Разбор настроек в памяти, без временного файла на диске
+            values = dotenv_values(stream=io.StringIO(decrypted_data.decode()))
+            token = _decrypted_env.set(values)
+            try:
+                return cls()
+            finally:
+                _decrypted_env.reset(token)
         except Exception as e:
             print(f"Ошибка загрузки конфигурации: {e}")
             # Возвращаем настройки по умолчанию или пустые
@@ -68,6 +197,25 @@ class Settings(BaseSettings):
 
     model_config = SettingsConfigDict(env_file=".env")
 
+    @classmethod
+    def settings_customise_sources(
+        cls,
+        settings_cls,
+        init_settings,
+        env_settings,
+        dotenv_settings,
+        file_secret_settings,
+    ):
+        values = _decrypted_env.get()
+        if values is not None:
+            dotenv_settings = DecryptedEnvSource(settings_cls, values)
+        return (
+            init_settings,
+            env_settings,
+            dotenv_settings,
+            file_secret_settings,
+        )
+
 
 def init_settings():
     """Инициализация настроек при запуске"""
@@ -0,0 +1,148 @@
+# credential_export.py
+import re
+
+from auth import is_hashed
+from models import GroupsOrm, StudentsOrm
+from sqlalchemy import select, update
+
+HEADER = ['Логин', 'Пароль', 'ФИО', 'Группа']
+
+# Сколько строк забирать с сервера за раз (server-side cursor)
+YIELD_PER = 1000
+
+# Excel: не длиннее 31 символа и без []:*?/\
+SHEET_TITLE_LIMIT = 31
+SHEET_TITLE_FORBIDDEN = re.compile(r'[\[\]:*?/\\]')
+
+
+def sheet_title(name, used_titles):
+    """Допустимое и уникальное в книге название листа"""
+    base = SHEET_TITLE_FORBIDDEN.sub("_", name)[:SHEET_TITLE_LIMIT] or "Лист"
+    title = base
+    number = 2
+    while title in used_titles:
+        suffix = f" ({number})"
+        title = base[: SHEET_TITLE_LIMIT - len(suffix)] + suffix
+        number += 1
+    used_titles.add(title)
+    return title
+
+
+def export_students_query(group_id):
+    """Логины, пароли и ФИО студентов группы для экспорта"""
+    return (
+        select(
+            StudentsOrm.login,
+            StudentsOrm.password,
+            StudentsOrm.full_name,
+        )
+        .where(StudentsOrm.group_id == group_id)
+        .order_by(StudentsOrm.full_name)
+    )
+
+
+def reset_students_query(group_ids):
+    """Студенты групп для сброса паролей: id, логин, ФИО, группа"""
+    return (
+        select(
+            StudentsOrm.id,
+            StudentsOrm.login,
+            StudentsOrm.full_name,
+            GroupsOrm.name,
+        )
+        .join(GroupsOrm, GroupsOrm.id == StudentsOrm.group_id)
+        .where(StudentsOrm.group_id.in_(group_ids))
+        .order_by(GroupsOrm.name, StudentsOrm.full_name)
+    )
+
+
+def export_groups(session, file_path, group_ids, yield_per=YIELD_PER):
+    """
+    Потоковый экспорт логинов: строки идут из БД пачками по yield_per
+    прямо в write-only книгу openpyxl, каждая группа — свой лист.
+    Учётные данные не меняются: пароли, сохранённые хэшем, остаются
+    пустыми (их выдаёт импорт или сброс паролей).
+    Возвращает число выгруженных студентов (при 0 файл не создаётся).
+    """
+    from openpyxl import Workbook
+
+    groups = session.execute(
+        select(GroupsOrm.id, GroupsOrm.name)
+        .where(GroupsOrm.id.in_(group_ids))
+        .order_by(GroupsOrm.name)
+    ).all()
+
+    wb = Workbook(write_only=True)
+    used_titles = set()
+    exported = 0
+
+    for group_id, group_name in groups:
+        ws = wb.create_sheet(title=sheet_title(group_name, used_titles))
+        ws.append(HEADER)
+
+        rows = session.execute(
+            export_students_query(group_id).execution_options(
+                yield_per=yield_per
+            )
+        )
+        for login, password, full_name in rows:
+            if is_hashed(password):
+                password = ""
+            ws.append([login, password, full_name, group_name])
+            exported += 1
+
+    if exported:
+        wb.save(file_path)
+    return exported
+
+
+def group_students_for_reset(session, group_ids):
+    """Студенты групп для сброса паролей: [(id, логин, ФИО, группа), ...]"""
+    return session.execute(reset_students_query(group_ids)).all()
+
+
+def reset_passwords(session, stored_passwords):
+    """Новые хэши паролей {student_id: хэш} одним массовым UPDATE"""
+    if stored_passwords:
+        session.execute(
+            update(StudentsOrm),
+            [
+                {"id": student_id, "password": stored}
+                for student_id, stored in stored_passwords.items()
+            ],
+        )
+
+
+def write_credentials(file_path, students):
+    """
+    Только что выданные логины и пароли (импорт или сброс) в write-only
+    книгу, лист на группу. students — словари с login, password,
+    full_name, group_name. Возвращает число студентов (при 0 файл
+    не создаётся).
+    """
+    from openpyxl import Workbook
+
+    by_group = {}
+    for student in students:
+        by_group.setdefault(student["group_name"], []).append(student)
+
+    wb = Workbook(write_only=True)
+    used_titles = set()
+    written = 0
+    for group_name in sorted(by_group):
+        ws = wb.create_sheet(title=sheet_title(group_name, used_titles))
+        ws.append(HEADER)
+        for student in by_group[group_name]:
+            ws.append(
+                [
+                    student["login"],
+                    student["password"],
+                    student["full_name"],
+                    group_name,
+                ]
+            )
+            written += 1
+
+    if written:
+        wb.save(file_path)
+    return written
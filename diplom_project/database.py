@@ -1,96 +1,166 @@
 # database.py
-from sqlalchemy import URL, create_engine, text
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_sessionmaker,
-    create_async_engine,
-)
-from sqlalchemy.orm import (
-    sessionmaker,
-)  # Правильный импорт для синхронных сессий
-
-
-def init_databases():
-    """Инициализация подключений к БД"""
-    global sync_engine, async_engine, session_async_factory, session_sync_factory
-
-    from config import init_settings
-
-    try:
-        settings = init_settings()
-
-        # Инициализируем синхронный engine с настройками пула
-        sync_engine = create_engine(
-            url=settings.DATABASE_URL_psycopg,
-            echo=True,
-            pool_size=10,  # Размер пула
-            max_overflow=20,  # Максимальное количество соединений сверх pool_size
-            pool_pre_ping=True,  # Проверка соединения перед использованием
-            pool_recycle=3600,  # Пересоздавать соединения каждый час
+from uuid import uuid4
+
+from query_stats import enable_query_log, query_stats
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool
+
+
+def prepared_statement_name():
+    """
+    Уникальное имя запроса: PgBouncer может отдать соединение сервера,
+    на котором запрос с таким же именем подготовил другой клиент
+    """
+    return f"__asyncpg_{uuid4()}__"
+
+
+def engine_options(settings):
+    """Параметры create_async_engine для пула и режима PgBouncer"""
+    options = {
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,  # Проверка соединения перед использованием
+    }
+    if settings.DB_PGBOUNCER:
+        # Подготовленные запросы живут в серверном соединении, а PgBouncer
+        # меняет его между транзакциями — кэши запросов отключаем
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": prepared_statement_name,
+        }
+    if settings.DB_POOL_SIZE == 0:
+        # Пул на клиенте не держится, соединение открывается на запрос
+        # (обычно за PgBouncer). pool_size=0 у QueuePool означало бы
+        # пул без ограничения размера
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+class ConnectionManager:
+    """
+    Единственный engine и пул соединений процесса. Размер пула берётся
+    из Settings, engine создаётся в start() (а не при импорте) и
+    закрывается в dispose() при выходе из приложения.
+    """
+
+    def __init__(self):
+        self.engine = None
+        self.session_factory = None
+        self.pool_size = 0
+        self.query_log = False
+        self.connects = 0  # открыто соединений к серверу
+        self.checkouts = 0  # выдано соединений из пула
+        self.checked_out = 0  # занято сейчас
+        self.max_checked_out = 0  # максимум занятых одновременно
+
+    def start(self, settings):
+        from sqlalchemy.ext.asyncio import (
+            AsyncSession,
+            async_sessionmaker,
+            create_async_engine,
         )
 
-        # Инициализируем асинхронный engine с настройками пула
-        async_engine = create_async_engine(
+        self.engine = create_async_engine(
             url=settings.DATABASE_URL_asyncpg,
             echo=False,
-            pool_size=10,
-            max_overflow=20,
-            pool_pre_ping=True,  # Для async может потребоваться альтернативное решение
-            pool_recycle=3600,
+            **engine_options(settings),
         )
-
-        # Создаем session factories
-        session_async_factory = async_sessionmaker(
-            get_async_engine(), expire_on_commit=False, class_=AsyncSession
+        self.pool_size = settings.DB_POOL_SIZE
+        self.session_factory = async_sessionmaker(
+            self.engine, expire_on_commit=False, class_=AsyncSession
         )
-        session_sync_factory = sessionmaker(
-            bind=get_sync_engine(), expire_on_commit=False
+
+        pool_events = self.engine.sync_engine
+        event.listen(pool_events, "connect", self._on_connect)
+        event.listen(pool_events, "checkout", self._on_checkout)
+        event.listen(pool_events, "checkin", self._on_checkin)
+
+        # Время, число строк и место вызова каждого запроса
+        query_stats.slow_ms = settings.DB_SLOW_QUERY_MS
+        query_stats.attach(self.engine.sync_engine)
+        if settings.DB_QUERY_LOG:
+            enable_query_log(settings.DB_QUERY_LOG)
+            self.query_log = True
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, proxy):
+        self.checkouts += 1
+        self.checked_out += 1
+        self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.checked_out -= 1
+
+    def stats(self):
+        """Статистика пула соединений"""
+        return {
+            "pool_size": self.pool_size,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checked_out": self.checked_out,
+            "max_checked_out": self.max_checked_out,
+        }
+
+    async def dispose(self):
+        """Закрытие всех соединений пула"""
+        if self.engine is None:
+            return
+        stats = self.stats()
+        query_stats.detach(self.engine.sync_engine)
+        await self.engine.dispose()
+        self.engine = None
+        self.session_factory = None
+        print(
+            f"📊 Пул соединений: открыто {stats['connects']}, "
+            f"выдано {stats['checkouts']}, "
+            f"одновременно до {stats['max_checked_out']}"
         )
+        if self.query_log:
+            query_stats.report()
 
-        print("✅ Базы данных инициализированы успешно")
 
-    except Exception as e:
-        print(f"❌ Ошибка инициализации БД: {e}")
+# Подключение к БД текущего процесса
+connection_manager = ConnectionManager()
 
-        # Создаем заглушки чтобы избежать ошибок импорта
-        class DummyEngine:
-            def dispose(self):
-                pass
 
-        sync_engine = DummyEngine()
-        async_engine = DummyEngine()
-        session_async_factory = None
-        session_sync_factory = None
+def init_databases():
+    """Инициализация подключения к БД"""
+    from config import init_settings
 
+    try:
+        connection_manager.start(init_settings())
+        print("✅ Базы данных инициализированы успешно")
+    except Exception as e:
+        print(f"❌ Ошибка инициализации БД: {e}")
+        raise
 
-# Функции для безопасного доступа к engines
-def get_sync_engine():
-    if sync_engine is None:
-        raise RuntimeError(
-            "Sync engine не инициализирован. Вызовите init_databases() сначала."
-        )
-    return sync_engine
+
+async def close_databases():
+    """Закрытие подключения к БД при выходе из приложения"""
+    await connection_manager.dispose()
 
 
 def get_async_engine():
-    if async_engine is None:
+    if connection_manager.engine is None:
         raise RuntimeError(
-            "Async engine не инициализирован. Вызовите init_databases() сначала."
+            "Async engine не инициализирован. "
+            "Вызовите init_databases() сначала."
         )
-    return async_engine
+    return connection_manager.engine
 
 
 def get_async_session():
-    if session_async_factory is None:
-        raise RuntimeError(
-            "Async session factory не инициализирована. Вызовите init_databases() сначала."
-        )
-    return session_async_factory()
-
-
-def get_sync_session():
-    if session_sync_factory is None:
+    if connection_manager.session_factory is None:
         raise RuntimeError(
-            "Sync session factory не инициализирована. Вызовите init_databases() сначала."
+            "Async session factory не инициализирована. "
+            "Вызовите init_databases() сначала."
         )
-    return session_sync_factory()
+    return connection_manager.session_factory()
@@ -17,39 +17,44 @@ def setup_environment():
     )
 
 
-async def main_async():
-    """Асинхронная main функция"""
+async def connect_database(window):
+    """Подключение к БД в фоне, пока открыто окно входа"""
     try:
         print("🔄 Инициализация базы данных...")
 
         # Импорты внутри функции для изоляции ошибок
         from database import get_async_engine, init_databases
-        from models import Base
-        from sqlalchemy import text
+        from migrations import ensure_schema
 
-        # Инициализируем БД
-        init_databases()
-        async_engine = get_async_engine()
+        # Инициализируем БД (в потоке, чтобы окно оставалось отзывчивым)
+        await asyncio.get_running_loop().run_in_executor(
+            None, init_databases
+        )
 
-        async with async_engine.begin() as conn:
-            await conn.execute(text("CREATE SCHEMA IF NOT EXISTS public"))
-            await conn.run_sync(Base.metadata.create_all)
+        # Схема создаётся/обновляется без удаления данных
+        if await ensure_schema(get_async_engine()):
+            print("✅ Схема базы данных создана/обновлена")
 
         print("✅ База данных инициализирована")
 
-        # Импортируем и запускаем основное приложение
-        from login_window import (
-            LoginWindow,
-            insert_data_database,
-            setup_database,
-        )
+    except Exception as e:
+        print(f"❌ Ошибка инициализации БД: {e}")
+        traceback.print_exc()
+        window.set_database_ready(False, "Нет подключения к базе данных")
+        return
+
+    # Создаем учителя по умолчанию
+    await window.create_default_teacher()
+    window.set_database_ready(True)
+
+
+def run_app():
+    """Окно входа показывается сразу, БД подключается в фоне"""
+    try:
+        from login_window import LoginWindow
         from PyQt5 import QtWidgets
         from qasync import QEventLoop
 
-        # Настраиваем начальные данные
-        await setup_database()
-        await insert_data_database()
-
         # Создаем Qt приложение
         app = QtWidgets.QApplication(sys.argv)
         loop = QEventLoop(app)
@@ -59,13 +64,20 @@ async def main_async():
         window = LoginWindow()
         window.show()
 
-        # Создаем учителя по умолчанию
-        window.create_default_teacher()
-
         print("🚀 Приложение запущено успешно!")
 
         # Запускаем event loop
-        await loop.run_forever()
+        with loop:
+            loop.create_task(connect_database(window))
+            loop.run_forever()
+
+            # Окна закрыты — дописываем ответы, сохранение которых
+            # началось при закрытии окна теста, и закрываем соединения с БД
+            from attempt_writer import wait_pending_flushes
+            from database import close_databases
+
+            loop.run_until_complete(wait_pending_flushes())
+            loop.run_until_complete(close_databases())
 
     except Exception as e:
         print(f"❌ Критическая ошибка: {e}")
@@ -78,8 +90,7 @@ def main():
     try:
         setup_environment()
 
-        # Запускаем асинхронную main
-        asyncio.run(main_async())
+        run_app()
 
     except Exception as e:
         print(f"❌ Ошибка при запуске: {e}")
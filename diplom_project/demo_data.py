@@ -0,0 +1,155 @@
+# demo_data.py
+from database import get_async_session
+from models import (
+    AnswersCheckBoxOrm,
+    AnswersReplacementOrm,
+    QuestionsCheckBoxOrm,
+    QuestionsReplacementOrm,
+    TagsOrm,
+    TestsOrm,
+)
+from question_saver import question_summary
+
+
+async def insert_data_database():
+    async with get_async_session() as session:
+        answers1 = [
+            {
+                "text": "смещенной",
+                "is_corrected": False,
+            },
+            {
+                "text": "несмещенной",
+                "is_corrected": True,
+            },
+            {
+                "text": "состоятельной",
+                "is_corrected": True,
+            },
+            {
+                "text": "несостоятельной",
+                "is_corrected": False,
+            },
+            {
+                "text": "доверительной",
+                "is_corrected": False,
+            },
+            {
+                "text": "нормальной",
+                "is_corrected": False,
+            },
+        ]
+        answers2 = [
+            {
+                "text": "число опытов мало",
+                "is_corrected": True,
+            },
+            {
+                "text": "число опытов велика",
+                "is_corrected": False,
+            },
+            {
+                "text": "заданы большие (>50) значения случайной величины",
+                "is_corrected": False,
+            },
+            {
+                "text": "заданы маленькие (<1 значения случайной величины)",
+                "is_corrected": False,
+            },
+        ]
+        answers3 = [
+            "Строят прямые, уравнения которых получаются в результате замены в ограничениях знаков неравенств на знаки точных равенств",
+            "Находят полуплоскости, определяемые каждым из ограничений задачи",
+            "Находят многоугольник решений",
+            "Строят вектор",
+            "Строят прямую, проходящую через многоугольник решений",
+            "Передвигают прямую в направлении веткора, в результате чего-либо находят точку"
+            " (точки), в которой целвая функция принимает максимальное значение, "
+            "либо устанавливают неограниченность сверху функции нам ножестве планов",
+            "Определяют координаты точки максимума функции и вычисляют значение целевой функции"
+            "в этой точке",
+        ]
+
+        # Создаем тест
+        test = TestsOrm(
+            name_test="Первый тест",
+            teacher="Поляков",
+        )
+        session.add(test)
+        await session.flush()  # Получаем test.id
+
+        # Создаем теги и связываем их с тестом
+        tag1 = TagsOrm(name="Статистика", count=2, test_id=test.id)
+        tag2 = TagsOrm(
+            name="Линейное программирование", count=1, test_id=test.id
+        )
+        session.add_all([tag1, tag2])
+        await session.flush()  # Получаем tag.id
+
+        # Создаем вопросы и связываем их с тегами
+        text1 = (
+            "Выбрать все правильные варинат ответа\n"
+            "Оценка параметра рассположения должна быть ______"
+        )
+        question1 = QuestionsCheckBoxOrm(
+            question=text1,
+            summary=question_summary(text1),
+            test_id=test.id,
+            tag_id=tag1.id,  # Связываем вопрос с тегом через tag_id
+        )
+        session.add(question1)
+        await session.flush()  # Получаем question1.id
+
+        # Добавляем ответы для question1
+        for ans in answers1:
+            answer = AnswersCheckBoxOrm(
+                text=ans["text"],
+                is_correct=ans["is_corrected"],
+                question_id=question1.id,
+            )
+            session.add(answer)
+
+        text2 = (
+            "Выбрать правильный вариант ответа.\n"
+            "Для оценки параметра распределения случайной величины"
+            "используют доверительные интервалы, если"
+        )
+        question2 = QuestionsCheckBoxOrm(
+            question=text2,
+            summary=question_summary(text2),
+            test_id=test.id,
+            tag_id=tag1.id,  # Связываем вопрос с тегом через tag_id
+        )
+        session.add(question2)
+        await session.flush()  # Получаем question2.id
+
+        # Добавляем ответы для question2
+        for ans in answers2:
+            answer = AnswersCheckBoxOrm(
+                text=ans["text"],
+                is_correct=ans["is_corrected"],
+                question_id=question2.id,
+            )
+            session.add(answer)
+
+        text3 = (
+            "Последовательность решения задачи линейного "
+            "программирования на основе ее геометрической интерпретации"
+        )
+        question3 = QuestionsReplacementOrm(
+            question=text3,
+            summary=question_summary(text3),
+            test_id=test.id,
+            tag_id=tag2.id,  # Связываем вопрос с тегом через tag_id
+        )
+        session.add(question3)
+        await session.flush()  # Получаем question3.id
+
+        # Добавляем ответы для question3
+        for i, ans in enumerate(answers3, 1):
+            answer = AnswersReplacementOrm(
+                text=ans, number_in_answer=i, question_id=question3.id
+            )
+            session.add(answer)
+
+        await session.commit()
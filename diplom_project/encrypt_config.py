@@ -1,23 +1,12 @@
-import base64
-
+from config import derive_key
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 
 def encrypt_config(env_file_path, output_file, password):
     """Шифрует .env файл"""
     try:
-        # Генерация ключа из пароля
-        password_bytes = password.encode()
-        salt = b'salt_'  # Такая же соль как в config.py
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password_bytes))
+        # Генерация ключа из пароля (те же соль и итерации, что в config.py)
+        key = derive_key(password)
 
         # Чтение конфигурации
         with open(env_file_path, 'rb') as f:
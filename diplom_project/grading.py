@@ -0,0 +1,103 @@
+# grading.py
+import json
+from typing import FrozenSet, NamedTuple, Tuple
+
+from question_loader import CHECK_BOX, INPUT_STRING, REPLACEMENT
+
+
+def normalize_text(text):
+    """Ответ без учёта регистра (casefold) и лишних пробелов"""
+    return " ".join(text.casefold().split())
+
+
+def accepted_answers(answer):
+    """
+    Допустимые ответы вопроса с вводом строки. Несколько вариантов
+    задаются явно — JSON-массивом строк: ["Москва", "Moscow"]. Любой
+    другой текст (в том числе с "|") — один правильный ответ, как в уже
+    сохранённых тестах. Пустой правильный ответ, как и раньше,
+    засчитывает только пустой ввод.
+    """
+    text = answer or ""
+    if text.lstrip().startswith("["):
+        try:
+            variants = json.loads(text)
+        except ValueError:
+            variants = None
+        if (
+            isinstance(variants, list)
+            and variants
+            and all(isinstance(variant, str) for variant in variants)
+        ):
+            return tuple(variants)
+    return (text,)
+
+
+# ---- Проверка ответов. Вопрос компилируется один раз при загрузке
+# теста, ответ студента сравнивается с готовым эталоном. Не зависят от
+# Qt и годятся для перепроверки сохранённых ответов без интерфейса ----
+class ChoiceGrader(NamedTuple):
+    """Выбор: ответ — id отмеченных вариантов"""
+
+    correct: FrozenSet[int]
+
+    def grade(self, response):
+        return frozenset(response or ()) == self.correct
+
+
+class OrderGrader(NamedTuple):
+    """Упорядочивание: ответ — id вариантов в выбранном порядке"""
+
+    expected: Tuple[int, ...]
+
+    def grade(self, response):
+        return tuple(response or ()) == self.expected
+
+
+class TextGrader(NamedTuple):
+    """Ввод строки: ответ — введённый текст"""
+
+    accepted: FrozenSet[str]
+
+    def grade(self, response):
+        return normalize_text(response or "") in self.accepted
+
+
+def compile_grader(question_type, answer):
+    """
+    Проверка одного вопроса. answer — правильный ответ для ввода строки
+    (см. accepted_answers) или кортеж AnswerRecord.
+    """
+    if question_type == CHECK_BOX:
+        return ChoiceGrader(frozenset(a.id for a in answer if a.is_correct))
+    if question_type == REPLACEMENT:
+        return OrderGrader(
+            tuple(
+                a.id for a in sorted(answer, key=lambda a: a.number_in_answer)
+            )
+        )
+    if question_type == INPUT_STRING:
+        accepted = accepted_answers(answer)
+        return TextGrader(frozenset(normalize_text(text) for text in accepted))
+    raise ValueError(f"Неизвестный тип вопроса: {question_type}")
+
+
+def compile_graders(payload):
+    """Проверки всех вопросов теста: {(type, id): grader}"""
+    return {
+        (q.type, q.id): compile_grader(
+            q.type, q.answer if q.type == INPUT_STRING else q.answers
+        )
+        for q in payload.questions
+    }
+
+
+def regrade(graders, responses):
+    """
+    Пакетная перепроверка ответов [(type, id, ответ), ...]
+    (например, ResponsesOrm) -> [верно/неверно, ...]
+    """
+    return [
+        graders[(question_type, question_id)].grade(answer)
+        for question_type, question_id, answer in responses
+    ]
@@ -0,0 +1,134 @@
+# image_store.py
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from models import ImagesOrm
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+# Ссылка на изображение в HTML вопроса: <img src="img:<sha256>">
+IMAGE_SCHEME = "img"
+IMAGE_REF = re.compile(r'src="img:([0-9a-f]{64})"')
+
+
+def image_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def image_src(digest):
+    return f"{IMAGE_SCHEME}:{digest}"
+
+
+def image_refs(html):
+    """Хэши всех изображений, на которые ссылается HTML"""
+    return set(IMAGE_REF.findall(html or ""))
+
+
+class ImageCache:
+    """
+    Локальный LRU-кэш изображений {hash: (mime, data)} с лимитом в байтах.
+    Изображения, ещё не сохранённые в БД, из кэша не вытесняются.
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._pending = set()  # вставлены в редакторе, но не сохранены
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+            return entry
+
+    def put(self, digest, mime, data, pending=False):
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = (mime, data)
+                self.current_bytes += len(data)
+            if pending:
+                self._pending.add(digest)
+            self._evict()
+
+    def __contains__(self, digest):
+        with self._lock:
+            return digest in self._entries
+
+    def pending(self, digests):
+        with self._lock:
+            return [d for d in digests if d in self._pending]
+
+    def mark_stored(self, digests):
+        with self._lock:
+            self._pending.difference_update(digests)
+            self._evict()
+
+    def _evict(self):
+        for digest in list(self._entries):
+            if self.current_bytes <= self.max_bytes:
+                break
+            if digest in self._pending:
+                continue
+            _, data = self._entries.pop(digest)
+            self.current_bytes -= len(data)
+
+
+# Общий кэш процесса
+image_cache = ImageCache()
+
+
+def add_image(data, mime):
+    """Новое изображение из редактора: в кэш до сохранения теста"""
+    digest = image_hash(data)
+    image_cache.put(digest, mime, data, pending=True)
+    return digest
+
+
+def save_images(session, htmls):
+    """
+    Сохранение в БД новых изображений, на которые ссылаются вопросы.
+    Одинаковые картинки хранятся один раз. Возвращает сохранённые хэши,
+    после коммита их нужно передать в image_cache.mark_stored.
+    """
+    refs = set()
+    for html in htmls:
+        refs |= image_refs(html)
+
+    rows = []
+    for digest in image_cache.pending(refs):
+        mime, data = image_cache.get(digest)
+        rows.append({"hash": digest, "mime": mime, "data": data})
+
+    if rows:
+        session.execute(
+            pg_insert(ImagesOrm).on_conflict_do_nothing(
+                index_elements=[ImagesOrm.hash]
+            ),
+            rows,
+        )
+    return [row["hash"] for row in rows]
+
+
+def images_query(digests):
+    """Изображения по хэшам — по первичному ключу"""
+    return select(ImagesOrm.hash, ImagesOrm.mime, ImagesOrm.data).where(
+        ImagesOrm.hash.in_(digests)
+    )
+
+
+def fetch_images(session, htmls):
+    """Загрузка в кэш (одним запросом) изображений, которых там ещё нет"""
+    missing = set()
+    for html in htmls:
+        missing |= {d for d in image_refs(html) if d not in image_cache}
+    if not missing:
+        return
+
+    rows = session.execute(images_query(missing))
+    for digest, mime, data in rows:
+        image_cache.put(digest, mime, data)
@@ -1,36 +1,37 @@
+import asyncio
 import base64
 import os
 import re
-import secrets
-import string
-
-import pandas as pd
-from database import get_async_engine, get_sync_engine
-from models import (
-    AnswersCheckBoxOrm,
-    AnswersReplacementOrm,
-    Base,
-    GroupsOrm,
-    QuestionsCheckBoxOrm,
-    QuestionsInputStringOrm,
-    QuestionsReplacementOrm,
-    StudentsOrm,
-    TagsOrm,
-    TeachersOrm,
-    TestsOrm,
-)
-from openpyxl import Workbook
+import sys
+from contextlib import contextmanager
+
+from attempt_writer import AttemptWriter
+from auth import authenticate
+from grading import compile_grader
+from image_store import IMAGE_SCHEME, add_image, image_cache, image_src
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QFont, QImage, QTextCharFormat
 from PyQt5.QtWidgets import QFileDialog
-from sqlalchemy import delete, select, text
-from sqlalchemy.ext.asyncio import async_sessionmaker
-from sqlalchemy.orm import selectinload, sessionmaker
-
-# Используйте функции для получения engines когда нужно
-async_engine = get_async_engine()
-sync_engine = get_sync_engine()
+from qasync import asyncSlot
+from question_loader import CHECK_BOX, INPUT_STRING, NO_TAG, REPLACEMENT
+from repository import (
+    ensure_default_teacher,
+    export_credentials,
+    get_test_info,
+    group_students,
+    import_students_file,
+    list_groups,
+    list_tests,
+    load_editor_question,
+    load_editor_summaries,
+    load_exam_payload,
+    reset_group_passwords,
+    save_test,
+    test_name_exists,
+)
+from question_saver import question_summary
+from student_import import generate_credentials
 
 # Установка пути к плагинам PyQt5 (если нужно)
 os.environ["QT_QPA_PLATFORM_PLUGIN_PATH"] = os.path.join(
@@ -38,15 +39,39 @@ os.environ["QT_QPA_PLATFORM_PLUGIN_PATH"] = os.path.join(
     "venv/Lib/site-packages/PyQt5/Qt5/plugins/platforms",
 )
 
-session_async_factory = async_sessionmaker(async_engine)
-session_sync_factory = sessionmaker(bind=sync_engine, expire_on_commit=False)
-
 fmt = QtGui.QTextTableFormat()
 fmt.setBorder(1)  # Толщина внешней рамки
 fmt.setCellPadding(7)  # Отступ внутри ячеек
 fmt.setCellSpacing(0)
 
 
+@contextmanager
+def busy(*widgets):
+    """Курсор ожидания и блокировка кнопок, пока идёт запрос к БД"""
+    QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+    for widget in widgets:
+        widget.setEnabled(False)
+    try:
+        yield
+    finally:
+        for widget in widgets:
+            widget.setEnabled(True)
+        QtWidgets.QApplication.restoreOverrideCursor()
+
+
+def show_message(parent, icon, title, text):
+    """
+    Сообщение через open(), а не exec_(): вложенный цикл событий внутри
+    корутины qasync ломает другие задачи. Можно вызывать после await.
+    """
+    box = QtWidgets.QMessageBox(
+        icon, title, text, QtWidgets.QMessageBox.Ok, parent
+    )
+    box.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+    box.open()
+    return box
+
+
 # Чистит полносью layout
 def clear_layout(layout):
     while layout.count():
@@ -61,91 +86,183 @@ def clear_layout(layout):
 
 # Миксин для реализации вопросов с очередностью
 class QuestionReplacementMixin:
-    def handle_replacement_click(self, button):
+    def handle_replacement_click(self, position):
         # если вопрос уже отвечен — клики игнорируем
         if not self.not_look_question[self.current_index]:
             return
 
-        if button in self.replacement_order:
-            self.replacement_order.remove(button)
+        if position in self.replacement_order:
+            self.replacement_order.remove(position)
         else:
-            self.replacement_order.append(button)
+            self.replacement_order.append(position)
 
         self.update_replacement_labels()
 
-        all_selected = len(self.replacement_order) == len(
-            self.current_question.get("replacement_buttons", [])
-        )
-
         # включаем "ответить" только если вопрос ещё не отвечен
         self.navigation_on_questions.btn_reply_question.setEnabled(
-            all_selected and self.not_look_question[self.current_index]
+            self.check_replacement_ready()
+            and self.not_look_question[self.current_index]
         )
 
     def update_replacement_labels(self):
-        # Нумерация выбранных кнопок
-        for i, button in enumerate(self.replacement_order):
-            button.setText(f"{i+1}")
-        # Остальные кнопки остаются пустыми
-        for button in self.current_question.get("replacement_buttons", []):
-            if button not in self.replacement_order:
-                button.setText("")
+        # Нумерация выбранных кнопок, остальные остаются пустыми
+        self.answer_pools[REPLACEMENT].show_order(self.replacement_order)
+
+
+# Миксин для отрисовки изображений вида img:<hash> из локального кэша
+class ImageResourceMixin:
+    def loadResource(self, resource_type, url):
+        if url.scheme() == IMAGE_SCHEME:
+            entry = image_cache.get(url.path())
+            if entry is None:
+                return QImage()
+            return QImage.fromData(entry[1])
+        return super().loadResource(resource_type, url)
+
 
+class ImageTextBrowser(ImageResourceMixin, QtWidgets.QTextBrowser):
+    pass
+
+
+class CustomTextEdit(ImageResourceMixin, QtWidgets.QTextEdit):
+    # Максимальный размер сохраняемого изображения, пикселей
+    max_image_width = 1024
+    max_image_height = 1024
+    # PNG больше этого размера пробуем пережать в JPEG/WebP
+    lossy_threshold = 100 * 1024
+    lossy_quality = 85
 
-class CustomTextEdit(QtWidgets.QTextEdit):
     def insertFromMimeData(self, source):
         cursor = self.textCursor()
 
         if source.hasHtml():
             html = source.html()
-            html = self._replace_image_sources_with_base64(html)
+            html = self._replace_image_sources(html)
             cursor.insertHtml(html)
         elif source.hasImage():
             image = source.imageData()
             if isinstance(image, QImage):
-                html_img = self._image_to_base64_html(image)
+                html_img = self._image_to_html(image)
                 cursor.insertHtml(html_img)
         elif source.hasText():
             cursor.insertText(source.text())
         else:
             super().insertFromMimeData(source)
 
-    def _replace_image_sources_with_base64(self, html):
+    # Картинки из вставленного HTML переносим в хранилище изображений
+    def _replace_image_sources(self, html):
         def repl(match):
             src = match.group(1)
-            if src.startswith("file:///"):
-                try:
-                    path = src.replace("file:///", "")
-                    with open(path, "rb") as f:
-                        data = f.read()
-                    base64_data = base64.b64encode(data).decode()
-                    return f'src="data:image/png;base64,{base64_data}"'
-                except Exception as e:
-                    print("Ошибка при обработке изображения:", e)
+            try:
+                image = None
+                if src.startswith("file:///"):
+                    image = self.read_image(src.replace("file:///", ""))
+                elif src.startswith("data:image/") and ";base64," in src:
+                    base64_data = src.split(",", 1)[1]
+                    image = QImage.fromData(base64.b64decode(base64_data))
+                if image is not None and not image.isNull():
+                    return f'src="{image_src(self._store_image(image))}"'
+            except Exception as e:
+                print("Ошибка при обработке изображения:", e)
             return f'src="{src}"'  # оставить как есть, если не удалось
 
         return re.sub(r'src="([^"]+)"', repl, html)
 
-    def _image_to_base64_html(self, image):
+    @staticmethod
+    def read_image(path):
+        """Изображение из файла с учётом EXIF-поворота"""
+        reader = QtGui.QImageReader(path)
+        reader.setAutoTransform(True)
+        return reader.read()
+
+    def _image_to_html(self, image):
+        digest = self._store_image(image)
+        return f'<img src="{image_src(digest)}" style="max-width:100%; width:300px; height:auto;" />'
+
+    def _store_image(self, image):
+        data, mime = self._ingest_image(image)
+        return add_image(data, mime)
+
+    @staticmethod
+    def _is_opaque(image):
+        """Все пиксели с alpha = 255"""
+        argb = image.convertToFormat(QImage.Format_ARGB32)
+        data = argb.constBits().asstring(argb.sizeInBytes())
+        # Пиксель ARGB32 — число 0xAARRGGBB в порядке байт платформы
+        alpha = data[3::4] if sys.byteorder == "little" else data[0::4]
+        return alpha == b"\xff" * len(alpha)
+
+    # Подготовка изображения к хранению: уменьшение, очистка, сжатие
+    def _ingest_image(self, image):
+        if (
+            image.width() > self.max_image_width
+            or image.height() > self.max_image_height
+        ):
+            image = image.scaled(
+                self.max_image_width,
+                self.max_image_height,
+                QtCore.Qt.KeepAspectRatio,
+                QtCore.Qt.SmoothTransformation,
+            )
+
+        # Перерисовываем в чистое изображение, чтобы не тащить метаданные.
+        # Буфер обмена и скриншоты приходят в ARGB32 и без прозрачности —
+        # смотрим на сами пиксели, а не на формат
+        has_alpha = image.hasAlphaChannel() and not self._is_opaque(image)
+        clean = QImage(
+            image.size(),
+            QImage.Format_ARGB32 if has_alpha else QImage.Format_RGB32,
+        )
+        clean.fill(QtCore.Qt.transparent if has_alpha else QtCore.Qt.white)
+        painter = QtGui.QPainter(clean)
+        painter.drawImage(0, 0, image)
+        painter.end()
+
+        # Схемы, скриншоты и картинки с прозрачностью — PNG,
+        # фотографии (большой PNG) — JPEG или WebP, что окажется меньше
+        best = (self._encode_image(clean, "PNG"), "image/png")
+        if has_alpha or len(best[0]) <= self.lossy_threshold:
+            return best
+
+        supported = {
+            bytes(fmt).lower()
+            for fmt in QtGui.QImageWriter.supportedImageFormats()
+        }
+        for fmt, mime in (("JPEG", "image/jpeg"), ("WEBP", "image/webp")):
+            if fmt.lower().encode() not in supported:
+                continue
+            data = self._encode_image(clean, fmt, self.lossy_quality)
+            if data and len(data) < len(best[0]):
+                best = (data, mime)
+        return best
+
+    @staticmethod
+    def _encode_image(image, fmt, quality=-1):
         buffer = QtCore.QBuffer()
         buffer.open(QtCore.QBuffer.WriteOnly)
-        image.save(buffer, "PNG")
-        base64_data = base64.b64encode(buffer.data()).decode()
-        return f'<img src="data:image/png;base64,{base64_data}" style="max-width:100%; width:300px; height:auto;" />'
+        image.save(buffer, fmt, quality)
+        return bytes(buffer.data())
 
 
 # Реализация боковой панели со списков вопросов при прохождении теста
 class QuestionGrid(QtWidgets.QFrame):
+    STATUS_COLORS = {
+        "Выбран": "lightblue",  # временная подсветка, не сохраняем в status
+        "Отвечен": "lightgreen",
+        "Пропущен": "orange",
+        "Не просмотрен": "white",
+    }
+
+    # Значение динамического свойства "status" кнопки для каждого статуса
+    STATUS_PROPERTIES = {
+        "Отвечен": "answered",
+        "Пропущен": "skipped",
+        "Не просмотрен": "new",
+    }
+
     def __init__(self, total_questions=12, cols=3):
         super().__init__()
 
-        self.STATUS_COLORS = {
-            "Выбран": "lightblue",  # временная подсветка, не сохраняем в status
-            "Отвечен": "lightgreen",
-            "Пропущен": "orange",
-            "Не просмотрен": "white",
-        }
-
         self.buttons = []
         self.status = []  # реальный статус каждой кнопки (без "Выбран")
         self.selected_index = None  # кто сейчас открыт
@@ -155,6 +272,10 @@ class QuestionGrid(QtWidgets.QFrame):
         self.setFrameShadow(QtWidgets.QFrame.Plain)
         self.setLineWidth(1)
 
+        # Одна таблица стилей на всю сетку: цвет кнопки выбирается по её
+        # свойствам, а не отдельным setStyleSheet на каждую кнопку
+        self.setStyleSheet(self._grid_style_sheet())
+
         main_layout = QtWidgets.QVBoxLayout()
         title = QtWidgets.QLabel("Вопросы")
         title.setAlignment(QtCore.Qt.AlignCenter)
@@ -169,10 +290,11 @@ class QuestionGrid(QtWidgets.QFrame):
         for i in range(total_questions):
             btn = QtWidgets.QPushButton(str(i + 1))
             btn.setFixedSize(40, 40)  # кнопки оставляем ВКЛЮЧЁННЫМИ
+            btn.setProperty("status", self.STATUS_PROPERTIES["Не просмотрен"])
+            btn.setProperty("selected", False)
             self.buttons.append(btn)
             self.status.append("Не просмотрен")
             self.grid.addWidget(btn, i // cols, i % cols)
-            self._apply_status_color(i)
 
         self.grid.setRowStretch((total_questions // cols) + 1, 1)
         main_layout.addLayout(self.grid)
@@ -182,15 +304,38 @@ class QuestionGrid(QtWidgets.QFrame):
             QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Expanding
         )
 
+    @classmethod
+    def _grid_style_sheet(cls):
+        rules = [
+            f'QPushButton[status="{value}"] '
+            f"{{ background-color: {cls.STATUS_COLORS[status]}; "
+            f"border-radius: 5px; }}"
+            for status, value in cls.STATUS_PROPERTIES.items()
+        ]
+        # Последнее правило той же специфичности перекрывает предыдущие
+        rules.append(
+            'QPushButton[selected="true"] '
+            f"{{ background-color: {cls.STATUS_COLORS['Выбран']}; }}"
+        )
+        return "\n".join(rules)
+
     def _apply_status_color(self, index: int):
         """Красим кнопку: если выбран — синий, иначе по реальному статусу."""
-        if index == self.selected_index:
-            color = self.STATUS_COLORS["Выбран"]
-        else:
-            color = self.STATUS_COLORS.get(self.status[index], "white")
-        self.buttons[index].setStyleSheet(
-            f"background-color: {color}; border-radius: 5px;"
-        )
+        btn = self.buttons[index]
+        status = self.STATUS_PROPERTIES.get(self.status[index], "new")
+        selected = index == self.selected_index
+        if (btn.property("status"), btn.property("selected")) == (
+            status,
+            selected,
+        ):
+            return
+
+        btn.setProperty("status", status)
+        btn.setProperty("selected", selected)
+        # Qt не пересчитывает стиль при смене свойства сам
+        style = btn.style()
+        style.unpolish(btn)
+        style.polish(btn)
 
     def set_button_status(self, index: int, status: str):
         """
@@ -216,14 +361,14 @@ class QuestionGrid(QtWidgets.QFrame):
         Если уход с вопроса, который не 'Отвечен' — помечаем его как 'Пропущен'.
         """
         prev = self.selected_index
-        if prev is not None:
-            if self.status[prev] != "Отвечен":
-                self.status[prev] = "Пропущен"
+        if prev is None:
+            return
+        if self.status[prev] != "Отвечен":
+            self.status[prev] = "Пропущен"
         self.selected_index = None
 
-        # Перекрашиваем всё, чтобы цвета точно соответствовали статусам
-        for i in range(len(self.buttons)):
-            self._apply_status_color(i)
+        # Перекрашиваем только кнопку, с которой ушли
+        self._apply_status_color(prev)
 
 
 # Нижняя рамка с перемещением между вопросами
@@ -249,6 +394,116 @@ class NavigationOnQuestion(QtWidgets.QWidget):
         self.setLayout(main_layout)
 
 
+# Виджеты ответа для каждого типа вопроса. Создаются один раз на окно
+# теста и заполняются данными очередного вопроса (bind), а не
+# пересоздаются при каждом переходе между вопросами
+class CheckBoxAnswers(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.checkboxes = []
+        self.count = 0  # сколько флажков занято текущим вопросом
+
+        self.main_layout = QtWidgets.QVBoxLayout(self)
+        self.main_layout.setContentsMargins(0, 0, 0, 0)
+        self.main_layout.addStretch()
+
+    def bind(self, answers, state):
+        """Варианты ответа вопроса и отмеченные ранее (индексы)"""
+        checked = set(state or ())
+        while len(self.checkboxes) < len(answers):
+            checkbox = QtWidgets.QCheckBox()
+            self.main_layout.insertWidget(len(self.checkboxes), checkbox)
+            self.checkboxes.append(checkbox)
+
+        self.count = len(answers)
+        for i, checkbox in enumerate(self.checkboxes):
+            if i < self.count:
+                checkbox.setText(answers[i].text)
+                checkbox.setChecked(i in checked)
+            checkbox.setVisible(i < self.count)
+
+    def state(self):
+        return [
+            i
+            for i, checkbox in enumerate(self.checkboxes[: self.count])
+            if checkbox.isChecked()
+        ]
+
+
+class ReplacementAnswers(QtWidgets.QWidget):
+    def __init__(self, on_click, parent=None):
+        super().__init__(parent)
+        self.on_click = on_click  # on_click(номер строки)
+        self.rows = []  # (строка, кнопка с номером, текст варианта)
+        self.count = 0
+        self.order = []  # строки в порядке, выбранном студентом
+
+        # Общая таблица стилей вместо setStyleSheet на каждую кнопку
+        self.setStyleSheet("QPushButton { background-color: lightgray; }")
+        self.main_layout = QtWidgets.QVBoxLayout(self)
+        self.main_layout.setContentsMargins(0, 0, 0, 0)
+        self.main_layout.addStretch()
+
+    def _add_row(self):
+        position = len(self.rows)
+        row = QtWidgets.QWidget()
+        hbox = QtWidgets.QHBoxLayout(row)
+        hbox.setContentsMargins(0, 0, 0, 0)
+
+        btn = QtWidgets.QPushButton("")
+        btn.setFixedSize(20, 20)
+        btn.clicked.connect(lambda _, p=position: self.on_click(p))
+
+        label = QtWidgets.QLabel()
+        label.setSizePolicy(
+            QtWidgets.QSizePolicy.Expanding,
+            QtWidgets.QSizePolicy.Preferred,
+        )
+
+        hbox.addWidget(btn)
+        hbox.addWidget(label)
+        self.main_layout.insertWidget(position, row)
+        self.rows.append((row, btn, label))
+
+    def bind(self, answers, state):
+        """Варианты ответа вопроса и выбранный ранее порядок"""
+        while len(self.rows) < len(answers):
+            self._add_row()
+
+        self.count = len(answers)
+        for i, (row, _, label) in enumerate(self.rows):
+            if i < self.count:
+                label.setText(answers[i].text)
+            row.setVisible(i < self.count)
+        self.show_order(state or [])
+
+    def show_order(self, order):
+        self.order = list(order)
+        numbers = {position: i for i, position in enumerate(self.order, 1)}
+        for position, (_, btn, _) in enumerate(self.rows[: self.count]):
+            btn.setText(str(numbers[position]) if position in numbers else "")
+
+    def state(self):
+        return list(self.order)
+
+
+class InputStringAnswer(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.line_edit = QtWidgets.QLineEdit()
+
+        main_layout = QtWidgets.QVBoxLayout(self)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.addWidget(self.line_edit)
+        main_layout.addStretch()
+
+    def bind(self, answer, state):
+        self.line_edit.setText(state or "")
+
+    def state(self):
+        return self.line_edit.text()
+
+
 class TestInfoDialog(QtWidgets.QDialog):
     def __init__(self, parent=None, test_name=None, teacher_name=None):
         super().__init__(parent)
@@ -377,35 +632,30 @@ class LoginWindow(QtWidgets.QWidget):
 
         layout.addLayout(form_layout)
 
-        # Кнопка входа
+        # Кнопка входа (доступна после подключения к БД)
         self.login_btn = QtWidgets.QPushButton("Войти")
         self.login_btn.clicked.connect(self.authenticate)
         layout.addWidget(self.login_btn)
 
         self.setLayout(layout)
+        self.set_database_ready(False, "Подключение к базе данных...")
+
+    def set_database_ready(self, ready, message=""):
+        """Подключение к БД идёт в фоне: до его окончания вход недоступен"""
+        self.login_btn.setEnabled(ready)
+        self.status_label.setText(message)
 
-    def create_default_teacher(self):
+    async def create_default_teacher(self):
         try:
-            with session_sync_factory() as session:
-                existing_teacher = session.scalar(
-                    select(TeachersOrm).where(
-                        TeachersOrm.login == "teacher_admin"
-                    )
-                )
-                if not existing_teacher:
-                    teacher = TeachersOrm(
-                        login="teacher_admin",
-                        password="123",  # В реальном приложении нужно хэшировать!
-                    )
-                    session.add(teacher)
-                    session.commit()
-                    print("✅ Учитель по умолчанию создан")
-                else:
-                    print("✅ Учитель по умолчанию уже существует")
+            if await ensure_default_teacher():
+                print("✅ Учитель по умолчанию создан")
+            else:
+                print("✅ Учитель по умолчанию уже существует")
         except Exception as e:
             print(f"❌ Ошибка создания учителя по умолчанию: {e}")
 
-    def authenticate(self):
+    @asyncSlot()
+    async def authenticate(self):
         login = self.login_edit.text().strip()
         password = self.password_edit.text().strip()
 
@@ -413,24 +663,21 @@ class LoginWindow(QtWidgets.QWidget):
             self.show_status("Введите логин и пароль")
             return
 
-        with session_sync_factory() as session:
-            # Проверяем учителя
-            teacher = session.scalar(
-                select(TeachersOrm).where(TeachersOrm.login == login)
-            )
-            if teacher and teacher.password == password:
-                self.open_start_window(is_teacher=True)
-                return
+        try:
+            with busy(self.login_btn):
+                principal = await authenticate(login, password)
+        except Exception as e:
+            self.show_status(f"Ошибка подключения к базе данных: {e}")
+            return
 
-            # Проверяем студента
-            student = session.scalar(
-                select(StudentsOrm).where(StudentsOrm.login == login)
-            )
-            if student and student.password == password:
-                self.open_start_window(is_teacher=False, student_id=student.id)
-                return
+        if principal is None:
+            self.show_status("Неверный логин или пароль")
+            return
 
-        self.show_status("Неверный логин или пароль")
+        self.open_start_window(
+            is_teacher=principal.is_teacher,
+            student_id=None if principal.is_teacher else principal.id,
+        )
 
     def show_status(self, message):
         self.status_label.setText(message)
@@ -513,21 +760,27 @@ class StartWindow(QtWidgets.QWidget):
     def logout(self):
         """Возврат к окну авторизации"""
         self.login_window = LoginWindow()
+        # БД уже подключена — вход доступен сразу
+        self.login_window.set_database_ready(True)
         self.login_window.show()
         self.close()
 
-    def load_tests(self):
-        self.test_list.clear()
-        self.test_items = {}
+    @asyncSlot()
+    async def load_tests(self):
+        try:
+            with busy():
+                tests = await list_tests()
+        except Exception as e:
+            print(f"Ошибка загрузки тестов: {e}")
+            return
 
-        with session_sync_factory() as session:
-            tests = session.scalars(select(TestsOrm)).all()
-            for test in tests:
-                item = QtWidgets.QListWidgetItem(
-                    f"{test.name_test} — {test.teacher}"
-                )
-                item.setData(QtCore.Qt.UserRole, test.id)
-                self.test_list.addItem(item)
+        # Список очищается после запроса: при повторном вызове
+        # в нём не появятся дубликаты
+        self.test_list.clear()
+        for test_id, name_test, teacher in tests:
+            item = QtWidgets.QListWidgetItem(f"{name_test} — {teacher}")
+            item.setData(QtCore.Qt.UserRole, test_id)
+            self.test_list.addItem(item)
 
     def confirm_test_selection(self, item):
         test_id = item.data(QtCore.Qt.UserRole)
@@ -540,11 +793,37 @@ class StartWindow(QtWidgets.QWidget):
             QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
         )
         if reply == QtWidgets.QMessageBox.Yes:
-            self.open_test_window(test_id, test_name)
+            asyncio.ensure_future(self.open_test_window(test_id, test_name))
+
+    async def open_test_window(self, test_id, test_name):
+        try:
+            with busy(self.test_list):
+                # Версия читается вместе с вопросами: попытка записывается
+                # с версией, которую студент действительно видит
+                test_version, payload = await load_exam_payload(test_id)
+        except Exception as e:
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Critical,
+                "Ошибка",
+                f"Не удалось загрузить тест: {e}",
+            )
+            return
+
+        questions = QuestionWindow.get_questions(payload)
+        # Ответы студента сохраняются, пробное прохождение преподавателем — нет
+        attempt_writer = None
+        if self.student_id is not None:
+            attempt_writer = AttemptWriter(
+                self.student_id, test_id, test_version, len(questions)
+            )
 
-    def open_test_window(self, test_id, test_name):
         self.qeustion_window = QuestionWindow(
-            id_test=test_id, test_name=test_name, start_window=self
+            id_test=test_id,
+            test_name=test_name,
+            start_window=self,
+            questions=questions,
+            attempt_writer=attempt_writer,
         )
         self.qeustion_window.show()
         self.close()
@@ -554,7 +833,8 @@ class StartWindow(QtWidgets.QWidget):
         self.qeustion_window.show()
         self.close()
 
-    def open_edit_test_window(self):
+    @asyncSlot()
+    async def open_edit_test_window(self):
         # Диалог выбора теста для редактирования
         dialog = QtWidgets.QDialog(self)
         dialog.setWindowTitle("Выбор теста для редактирования")
@@ -577,14 +857,17 @@ class StartWindow(QtWidgets.QWidget):
         layout.addLayout(button_layout)
 
         # Загрузка тестов
-        with session_sync_factory() as session:
-            tests = session.scalars(select(TestsOrm)).all()
-            for test in tests:
-                item = QtWidgets.QListWidgetItem(
-                    f"{test.name_test} — {test.teacher}"
-                )
-                item.setData(QtCore.Qt.UserRole, test.id)
-                test_list.addItem(item)
+        try:
+            with busy(self.btn_edit_test):
+                tests = await list_tests()
+        except Exception as e:
+            print(f"Ошибка загрузки тестов: {e}")
+            return
+
+        for test_id, name_test, teacher in tests:
+            item = QtWidgets.QListWidgetItem(f"{name_test} — {teacher}")
+            item.setData(QtCore.Qt.UserRole, test_id)
+            test_list.addItem(item)
 
         def on_select():
             selected_item = test_list.currentItem()
@@ -603,7 +886,8 @@ class StartWindow(QtWidgets.QWidget):
         cancel_btn.clicked.connect(on_cancel)
         test_list.itemDoubleClicked.connect(on_select)
 
-        dialog.exec_()
+        # open() не блокирует цикл событий, в отличие от exec_()
+        dialog.open()
 
     def open_question_editor_with_test(self, test_id, test_name):
         self.question_window = QuestionEditor(
@@ -620,7 +904,7 @@ class StudentManagementWindow(QtWidgets.QWidget):
         self.resize(800, 600)
 
         self.init_ui()
-        self.load_groups()
+        asyncio.ensure_future(self.load_groups())
 
     def init_ui(self):
         layout = QtWidgets.QVBoxLayout()
@@ -651,6 +935,17 @@ class StudentManagementWindow(QtWidgets.QWidget):
         export_layout.addWidget(QtWidgets.QLabel("Группа:"))
         export_layout.addWidget(self.export_group_selector)
 
+        self.export_several_btn = QtWidgets.QPushButton(
+            "Экспорт нескольких групп"
+        )
+        self.export_several_btn.clicked.connect(self.export_several_groups)
+        export_layout.addWidget(self.export_several_btn)
+
+        # Сброс паролей — отдельное явное действие, экспорт их не меняет
+        self.reset_passwords_btn = QtWidgets.QPushButton("Сбросить пароли")
+        self.reset_passwords_btn.clicked.connect(self.reset_passwords)
+        export_layout.addWidget(self.reset_passwords_btn)
+
         export_layout.addStretch()
         layout.addLayout(export_layout)
 
@@ -669,21 +964,22 @@ class StudentManagementWindow(QtWidgets.QWidget):
 
         self.setLayout(layout)
 
-    def load_groups(self):
+    async def load_groups(self):
         """Загрузка списка групп"""
-        self.export_group_selector.clear()
+        try:
+            with busy():
+                groups = await list_groups()
+        except Exception as e:
+            print(f"Ошибка загрузки групп: {e}")
+            return
 
-        with session_sync_factory() as session:
-            groups = session.scalars(select(GroupsOrm)).all()
-            for group in groups:
-                self.export_group_selector.addItem(group.name, group.id)
+        self.export_group_selector.clear()
+        for group_id, name in groups:
+            self.export_group_selector.addItem(name, group_id)
 
     def generate_credentials(self):
         """Генерация логина и пароля из 8 случайных символов"""
-        chars = string.ascii_letters + string.digits
-        login = ''.join(secrets.choice(chars) for _ in range(8))
-        password = ''.join(secrets.choice(chars) for _ in range(8))
-        return login, password
+        return generate_credentials()
 
     def import_from_excel(self):
         """Импорт студентов из Excel файла (с определением группы из файла)"""
@@ -694,71 +990,41 @@ class StudentManagementWindow(QtWidgets.QWidget):
         if not file_path:
             return
 
-        try:
-            df = pd.read_excel(file_path)
-            required_columns = ['ФИО', 'Группа']
-
-            if not all(col in df.columns for col in required_columns):
-                QtWidgets.QMessageBox.warning(
-                    self,
-                    "Ошибка",
-                    f"Файл должен содержать колонки: {', '.join(required_columns)}",
-                )
-                return
-
-            added_students = []  # для предпросмотра
-            last_group_name = None
-
-            with session_sync_factory() as session:
-                for _, row in df.iterrows():
-                    full_name = str(row['ФИО']).strip()
-                    group_name = str(row['Группа']).strip()
-
-                    if not full_name or not group_name:
-                        continue
+        # В БД пароли хранятся хэшами: открытым текстом они попадают
+        # только в этот файл, поэтому без него импорт не выполняется
+        credentials_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Сохранить логины и пароли новых студентов",
+            "логины_пароли_импорт.xlsx",
+            "Excel Files (*.xlsx)",
+        )
+        if not credentials_path:
+            return
 
-                    last_group_name = group_name  # запомним последнюю группу
+        # Диалоги — до запуска корутины: exec_() внутри задачи qasync
+        # запускает вложенный цикл событий
+        asyncio.ensure_future(
+            self.save_imported_students(file_path, credentials_path)
+        )
 
-                    # Находим или создаем группу
-                    group = session.scalar(
-                        select(GroupsOrm).where(GroupsOrm.name == group_name)
-                    )
-                    if not group:
-                        group = GroupsOrm(name=group_name)
-                        session.add(group)
-                        session.flush()
-
-                    # Генерируем уникальный логин
-                    while True:
-                        login, password = self.generate_credentials()
-                        existing = session.scalar(
-                            select(StudentsOrm).where(
-                                StudentsOrm.login == login
-                            )
-                        )
-                        if not existing:
-                            break
-
-                    student = StudentsOrm(
-                        login=login,
-                        password=password,
-                        full_name=full_name,
-                        group_id=group.id,
-                    )
-                    session.add(student)
-                    added_students.append(
-                        {
-                            "login": login,
-                            "password": password,
-                            "full_name": full_name,
-                            "group_name": group.name,
-                        }
+    async def save_imported_students(self, file_path, credentials_path):
+        try:
+            try:
+                with busy(self.import_btn):
+                    rows, added_students = await import_students_file(
+                        file_path, credentials_path
                     )
+            except ValueError as e:
+                show_message(
+                    self, QtWidgets.QMessageBox.Warning, "Ошибка", str(e)
+                )
+                return
 
-                session.commit()
+            # запомним последнюю группу из файла
+            last_group_name = rows[-1][1] if rows else None
 
             # Обновляем список групп
-            self.load_groups()
+            await self.load_groups()
 
             # Если мы знаем последнюю группу из импорта → выбираем её в ComboBox
             if last_group_name:
@@ -766,18 +1032,25 @@ class StudentManagementWindow(QtWidgets.QWidget):
                 if index != -1:
                     self.export_group_selector.setCurrentIndex(index)
                     # Сразу вызываем предпросмотр
-                    self.preview_group_students()
+                    await self.preview_group_students()
 
             # Предпросмотр только добавленных
             self.show_students_in_table(added_students, from_preview=True)
 
-            QtWidgets.QMessageBox.information(
-                self, "Успех", f"Добавлено {len(added_students)} студентов"
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Information,
+                "Успех",
+                f"Добавлено {len(added_students)} студентов\n"
+                f"Логины и пароли сохранены в {credentials_path}",
             )
 
         except Exception as e:
-            QtWidgets.QMessageBox.critical(
-                self, "Ошибка", f"Ошибка импорта: {str(e)}"
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Critical,
+                "Ошибка",
+                f"Ошибка импорта: {str(e)}",
             )
 
     def export_credentials(self):
@@ -797,92 +1070,177 @@ class StudentManagementWindow(QtWidgets.QWidget):
         if not file_path:
             return
 
+        asyncio.ensure_future(self.save_credentials(file_path, [group_id]))
+
+    def export_several_groups(self):
+        """Экспорт логинов и паролей нескольких групп (лист на группу)"""
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle("Выбор групп для экспорта")
+        dialog.resize(400, 400)
+
+        layout = QtWidgets.QVBoxLayout(dialog)
+        group_list = QtWidgets.QListWidget()
+        group_list.setSelectionMode(
+            QtWidgets.QAbstractItemView.ExtendedSelection
+        )
+        for i in range(self.export_group_selector.count()):
+            item = QtWidgets.QListWidgetItem(
+                self.export_group_selector.itemText(i)
+            )
+            item.setData(
+                QtCore.Qt.UserRole, self.export_group_selector.itemData(i)
+            )
+            group_list.addItem(item)
+        layout.addWidget(QtWidgets.QLabel("Выберите группы:"))
+        layout.addWidget(group_list)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel
+        )
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+
+        group_ids = [
+            item.data(QtCore.Qt.UserRole)
+            for item in group_list.selectedItems()
+        ]
+        if not group_ids:
+            QtWidgets.QMessageBox.warning(self, "Ошибка", "Выберите группы")
+            return
+
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Сохранить как",
+            "логины_пароли.xlsx",
+            "Excel Files (*.xlsx)",
+        )
+        if not file_path:
+            return
+
+        asyncio.ensure_future(self.save_credentials(file_path, group_ids))
+
+    async def save_credentials(self, file_path, group_ids):
         try:
-            with session_sync_factory() as session:
-                # ИСПРАВЛЕНИЕ: добавляем фильтр по группе
-                students = session.scalars(
-                    select(StudentsOrm)
-                    .where(
-                        StudentsOrm.group_id == group_id
-                    )  # Фильтруем по выбранной группе
-                    .options(selectinload(StudentsOrm.group))
-                ).all()
-
-                if not students:
-                    QtWidgets.QMessageBox.warning(
-                        self, "Ошибка", "В выбранной группе нет студентов"
-                    )
-                    return
-
-                # Создаем Excel файл
-                wb = Workbook()
-                ws = wb.active
-                ws.title = "Логины и пароли"
-
-                # Заголовки
-                ws.append(['Логин', 'Пароль', 'ФИО', 'Группа'])
-
-                # Данные
-                for student in students:
-                    ws.append(
-                        [
-                            student.login,
-                            student.password,
-                            student.full_name,
-                            student.group.name,
-                        ]
-                    )
+            with busy(self.export_btn, self.export_several_btn):
+                exported = await export_credentials(file_path, group_ids)
 
-                wb.save(file_path)
-                QtWidgets.QMessageBox.information(
-                    self, "Успех", f"Данные экспортированы в {file_path}"
+            if not exported:
+                show_message(
+                    self,
+                    QtWidgets.QMessageBox.Warning,
+                    "Ошибка",
+                    "В выбранных группах нет студентов",
                 )
+                return
+
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Information,
+                "Успех",
+                f"Данные экспортированы в {file_path}\n"
+                "Пароли выдаются только при импорте и сбросе паролей",
+            )
 
         except Exception as e:
-            QtWidgets.QMessageBox.critical(
-                self, "Ошибка", f"Ошибка экспорта: {str(e)}"
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Critical,
+                "Ошибка",
+                f"Ошибка экспорта: {str(e)}",
             )
 
-    def preview_group_students(self):
-        """Предпросмотр студентов выбранной группы в таблице"""
+    def reset_passwords(self):
+        """Новые пароли всем студентам выбранной группы"""
         group_id = self.export_group_selector.currentData()
         if not group_id:
+            QtWidgets.QMessageBox.warning(self, "Ошибка", "Выберите группу")
+            return
+
+        group_name = self.export_group_selector.currentText()
+        reply = QtWidgets.QMessageBox.question(
+            self,
+            "Сброс паролей",
+            f"Всем студентам группы {group_name} будут назначены новые "
+            "пароли — прежние сразу перестанут действовать. Продолжить?",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            QtWidgets.QMessageBox.No,
+        )
+        if reply != QtWidgets.QMessageBox.Yes:
             return
 
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Сохранить новые пароли",
+            f"новые_пароли_{group_name}.xlsx",
+            "Excel Files (*.xlsx)",
+        )
+        if not file_path:
+            return
+
+        asyncio.ensure_future(self.save_new_passwords(file_path, [group_id]))
+
+    async def save_new_passwords(self, file_path, group_ids):
         try:
-            with session_sync_factory() as session:
-                students = session.scalars(
-                    select(StudentsOrm)
-                    .where(StudentsOrm.group_id == group_id)
-                    .options(selectinload(StudentsOrm.group))
-                ).all()
-
-                students_data = []
-                for student in students:
-                    students_data.append(
-                        {
-                            "login": student.login,
-                            "password": student.password,
-                            "full_name": student.full_name,
-                            "group_name": student.group.name,
-                        }
-                    )
+            with busy(self.reset_passwords_btn):
+                reset = await reset_group_passwords(file_path, group_ids)
+        except Exception as e:
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Critical,
+                "Ошибка",
+                f"Не удалось сбросить пароли: {e}",
+            )
+            return
+
+        if not reset:
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Warning,
+                "Ошибка",
+                "В выбранной группе нет студентов",
+            )
+            return
+        show_message(
+            self,
+            QtWidgets.QMessageBox.Information,
+            "Успех",
+            f"Новые пароли ({reset}) сохранены в {file_path}",
+        )
 
-                self.show_students_in_table(students_data, from_preview=True)
+    @asyncSlot()
+    async def preview_group_students(self):
+        """Предпросмотр студентов выбранной группы в таблице"""
+        group_id = self.export_group_selector.currentData()
+        if not group_id:
+            return
 
+        try:
+            with busy():
+                students_data = await group_students(group_id)
         except Exception as e:
             print(f"Ошибка загрузки студентов: {e}")
+            return
+
+        # Пока шёл запрос, могли выбрать другую группу
+        if group_id == self.export_group_selector.currentData():
+            self.show_students_in_table(students_data, from_preview=True)
 
     def show_students_in_table(self, students_data, from_preview=False):
         """Отображение студентов в таблице"""
         self.students_table.setRowCount(len(students_data))
 
         for row, student in enumerate(students_data):
+            # Пароль, сохранённый хэшем, показать нельзя
+            password = student["password"] or "скрыт"
             self.students_table.setItem(
                 row, 0, QtWidgets.QTableWidgetItem(student["login"])
             )
             self.students_table.setItem(
-                row, 1, QtWidgets.QTableWidgetItem(student["password"])
+                row, 1, QtWidgets.QTableWidgetItem(password)
             )
             self.students_table.setItem(
                 row, 2, QtWidgets.QTableWidgetItem(student["full_name"])
@@ -949,6 +1307,10 @@ class QuestionEditorWidget(QtWidgets.QWidget):
         self.input_string_widget = QtWidgets.QLineEdit()
         self.input_string_widget.setFixedHeight(30)
         self.input_string_widget.setFont(self.font_for_answer)
+        self.input_string_widget.setToolTip(
+            "Несколько допустимых ответов — JSON-массивом: "
+            '["Москва", "Moscow"]'
+        )
         self.answer_widget_container.addWidget(self.input_string_widget)
 
         # Несколько правильных ответов (Checkboxes)
@@ -1114,6 +1476,90 @@ class QuestionEditorWidget(QtWidgets.QWidget):
         self._update_delete_buttons()
 
 
+class QuestionListModel(QtCore.QAbstractListModel):
+    """
+    Список вопросов редактора. Строка — словарь {"key", "tag", "summary",
+    "entry"}: HTML и ответы (entry) есть только у новых и открытых
+    вопросов. Строки показываются порциями по мере прокрутки (fetchMore).
+    """
+
+    FETCH_BATCH = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._shown = 0  # сколько строк уже отдано представлению
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._shown
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._shown < len(self._rows)
+
+    def fetchMore(self, parent):
+        count = min(self.FETCH_BATCH, len(self._rows) - self._shown)
+        if parent.isValid() or count <= 0:
+            return
+        self.beginInsertRows(
+            QtCore.QModelIndex(), self._shown, self._shown + count - 1
+        )
+        self._shown += count
+        self.endInsertRows()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._shown:
+            return None
+        row = self._rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return f"{row['tag'] or NO_TAG} — {row['summary']}"
+        if role == QtCore.Qt.ToolTipRole:
+            return row["summary"]
+        return None
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._rows = rows
+        self._shown = min(self.FETCH_BATCH, len(rows))
+        self.endResetModel()
+
+    def question(self, position):
+        return self._rows[position]
+
+    def count(self):
+        return len(self._rows)
+
+    def append_question(self, row):
+        position = len(self._rows)
+        if self._shown < position:
+            # Появится при прокрутке до конца списка
+            self._rows.append(row)
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), position, position)
+        self._rows.append(row)
+        self._shown += 1
+        self.endInsertRows()
+
+    def update_question(self, position, **changes):
+        self._rows[position].update(changes)
+        if position < self._shown:
+            index = self.index(position)
+            self.dataChanged.emit(index, index)
+
+    def take_question(self, position):
+        if position >= self._shown:
+            return self._rows.pop(position)
+        self.beginRemoveRows(QtCore.QModelIndex(), position, position)
+        row = self._rows.pop(position)
+        self._shown -= 1
+        self.endRemoveRows()
+        return row
+
+    def edited_questions(self):
+        """(вопросы, ключи) новых и открытых в редакторе вопросов"""
+        rows = [row for row in self._rows if row["entry"] is not None]
+        return [row["entry"] for row in rows], [row["key"] for row in rows]
+
+
 class QuestionEditor(QtWidgets.QWidget):
     def __init__(self, test_id=None, test_name=None):
         super().__init__()
@@ -1126,7 +1572,15 @@ class QuestionEditor(QtWidgets.QWidget):
         else:
             self.setWindowTitle("Создание теста")
 
-        self.questions = []  # Список временных вопросов
+        # Список вопросов: ключ (тип, id) в БД (None — вопрос ещё не
+        # сохранён), тег, краткий текст и сам вопрос, если он открывался
+        self.question_model = QuestionListModel(self)
+        # Вопросы в том виде, в котором они были загружены из БД
+        self.original_questions = {}
+        # Ключи вопросов, удалённых в редакторе
+        self.deleted_keys = set()
+        # (название, преподаватель) редактируемого теста
+        self.test_info = None
         self.current_edit_index = None
         self.flag_change_question = False
         self.current_load_tag = None
@@ -1177,16 +1631,20 @@ class QuestionEditor(QtWidgets.QWidget):
         self.add_question_btn = QtWidgets.QPushButton(
             "Добавить/Обновить вопрос"
         )
+        self.delete_question_btn = QtWidgets.QPushButton("Удалить вопрос")
 
         # Список вопросов
-        self.question_list = QtWidgets.QListWidget()
+        self.question_list = QtWidgets.QListView()
+        self.question_list.setModel(self.question_model)
+        self.question_list.setUniformItemSizes(True)
         self.question_list.setFixedWidth(240)
         self.save_test_btn = QtWidgets.QPushButton("Сохранить тест")
         right_layout = QtWidgets.QVBoxLayout()
         right_layout.addWidget(QtWidgets.QLabel("Список вопросов: "))
         right_layout.addWidget(self.question_list)
+        right_layout.addWidget(self.delete_question_btn)
         right_layout.addWidget(self.save_test_btn)
-        self.question_list.itemClicked.connect(self.load_selected_question)
+        self.question_list.clicked.connect(self.load_selected_question)
 
         left_layout = QtWidgets.QVBoxLayout()
         left_layout.addLayout(toolbar)
@@ -1204,10 +1662,11 @@ class QuestionEditor(QtWidgets.QWidget):
         self.load_image_btn.clicked.connect(self.insert_image)
         self.insert_table_btn.clicked.connect(self.insert_table)
         self.add_question_btn.clicked.connect(self.save_question_temp)
+        self.delete_question_btn.clicked.connect(self.delete_selected_question)
         self.save_test_btn.clicked.connect(self.save_all_questions)
 
         if test_id:
-            self.load_existing_test()
+            asyncio.ensure_future(self.load_existing_test())
 
     @QtCore.pyqtSlot()
     def insert_table(self):
@@ -1233,14 +1692,15 @@ class QuestionEditor(QtWidgets.QWidget):
             "",
             "Images (*.png *.jpg *.jpeg *.bmp)",
         )
-        if path:
-            image = QImage(path)
-            if image.isNull():
-                return
-        cursor = self.answer_on_question.question_text.textCursor()
-        html_img = self.answer_on_question.question_text._image_to_base64_html(
-            image
-        )
+        if not path:
+            return
+        question_text = self.answer_on_question.question_text
+        # Тот же путь чтения, что и для вставленных файлов: с EXIF-поворотом
+        image = question_text.read_image(path)
+        if image.isNull():
+            return
+        cursor = question_text.textCursor()
+        html_img = question_text._image_to_html(image)
         cursor.insertHtml(html_img)
 
     # Сохранение шаблона вопроса в память
@@ -1289,8 +1749,8 @@ class QuestionEditor(QtWidgets.QWidget):
 
         # если редактируем существующий вопрос
         if self.current_edit_index is not None:
-            _, _, _, old_tag = self.questions[self.current_edit_index]
-            old_tag_display = old_tag or "Без тэга"  # Для отображения
+            row = self.question_model.question(self.current_edit_index)
+            old_tag_display = row["tag"] or "Без тэга"  # Для отображения
 
             # Если тег изменился, обновляем счетчики
             if old_tag_display != tag_display:
@@ -1310,32 +1770,97 @@ class QuestionEditor(QtWidgets.QWidget):
                 self.unique_tag.get(tag_display, 0) + 1
             )
 
-        item_text = (
-            f"{tag_display} — {html[:50]}..."  # Обрезаем HTML для отображения
+        entry = (
+            html,
+            type_answer,
+            answer,
+            new_tag,  # Сохраняем как None если пусто
         )
+        # Текст без разметки для списка вопросов
+        summary = question_summary(html)
 
         if self.current_edit_index is not None:
-            self.questions[self.current_edit_index] = (
-                html,
-                type_answer,
-                answer,
-                new_tag,  # Сохраняем как None если пусто
+            self.question_model.update_question(
+                self.current_edit_index,
+                tag=new_tag,
+                summary=summary,
+                entry=entry,
             )
-            self.question_list.item(self.current_edit_index).setText(item_text)
             self.current_edit_index = None
         else:
-            self.questions.append((html, type_answer, answer, new_tag))
-            self.question_list.addItem(item_text)
+            self.question_model.append_question(
+                {
+                    "key": None,
+                    "tag": new_tag,
+                    "summary": summary,
+                    "entry": entry,
+                }
+            )
 
         self.current_load_tag = None
         self.clear_question_fields()
 
-    # Загрузка из памяти сохраненного вопроса
-    def load_selected_question(self, item):
+    # Удаление выбранного вопроса (из БД он удалится при сохранении теста)
+    @QtCore.pyqtSlot()
+    def delete_selected_question(self):
+        index = self.current_edit_index
+        if index is None:
+            index = self.question_list.currentIndex().row()
+        if index < 0 or index >= self.question_model.count():
+            return
+
+        row = self.question_model.take_question(index)
+        if row["key"] is not None:
+            self.deleted_keys.add(row["key"])
+
+        tag_display = row["tag"] or "Без тэга"
+        if tag_display in self.unique_tag:
+            self.unique_tag[tag_display] -= 1
+            if self.unique_tag[tag_display] <= 0:
+                del self.unique_tag[tag_display]
+
+        self.current_edit_index = None
+        self.current_load_tag = None
         self.clear_question_fields()
 
-        index = self.question_list.row(item)
-        html, type_answer, answer, tag = self.questions[index]
+    # Загрузка сохраненного вопроса (HTML из БД — только для открываемого)
+    @asyncSlot(QtCore.QModelIndex)
+    async def load_selected_question(self, model_index):
+        index = model_index.row()
+        row = self.question_model.question(index)
+
+        if row["entry"] is None:
+            try:
+                # Пока вопрос загружается, список и кнопки недоступны
+                with busy(
+                    self.question_list,
+                    self.add_question_btn,
+                    self.delete_question_btn,
+                ):
+                    entry = await load_editor_question(
+                        self.test_id, row["key"]
+                    )
+            except Exception as e:
+                show_message(
+                    self,
+                    QtWidgets.QMessageBox.Critical,
+                    "Ошибка",
+                    f"Не удалось загрузить вопрос: {e}",
+                )
+                return
+            if entry is None:
+                show_message(
+                    self,
+                    QtWidgets.QMessageBox.Warning,
+                    "Ошибка",
+                    "Вопрос не найден в базе данных",
+                )
+                return
+            self.original_questions[row["key"]] = entry
+            row["entry"] = entry
+
+        self.clear_question_fields()
+        html, type_answer, answer, tag = row["entry"]
 
         self.answer_on_question.question_text.setHtml(html)
 
@@ -1377,15 +1902,10 @@ class QuestionEditor(QtWidgets.QWidget):
         self.current_edit_index = index
 
     # Сохранение всех вопросов
-    @QtCore.pyqtSlot()
     def save_all_questions(self):
         # --- Ввод информации о тесте ---
-        if self.test_id:  # Если редактируем существующий тест
-            with session_sync_factory() as session:
-                test = session.get(TestsOrm, self.test_id)
-                test_dialog = TestInfoDialog(
-                    self, test.name_test, test.teacher
-                )
+        if self.test_info:  # Если редактируем существующий тест
+            test_dialog = TestInfoDialog(self, *self.test_info)
         else:  # Если создаем новый тест
             test_dialog = TestInfoDialog(self)
 
@@ -1409,255 +1929,104 @@ class QuestionEditor(QtWidgets.QWidget):
         else:
             return
 
-        with session_sync_factory() as session:
-            # Проверяем, существует ли уже тест с таким названием (только для нового теста)
-            if not self.test_id:
-                existing_test = session.scalar(
-                    select(TestsOrm).where(TestsOrm.name_test == name_test)
-                )
-                if existing_test:
-                    QtWidgets.QMessageBox.warning(
-                        self,
-                        "Ошибка",
-                        f"Тест с названием '{name_test}' уже существует. Пожалуйста, выберите другое название.",
-                    )
-                    return
-
-            # Если редактируем существующий тест, сначала удаляем старые данные
-            if self.test_id:
-                # Удаляем старые вопросы и связанные данные
-                session.execute(
-                    delete(QuestionsInputStringOrm).where(
-                        QuestionsInputStringOrm.test_id == self.test_id
-                    )
-                )
-                session.execute(
-                    delete(QuestionsCheckBoxOrm).where(
-                        QuestionsCheckBoxOrm.test_id == self.test_id
-                    )
-                )
-                session.execute(
-                    delete(QuestionsReplacementOrm).where(
-                        QuestionsReplacementOrm.test_id == self.test_id
-                    )
-                )
+        # Диалоги — до запуска корутины: exec_() внутри задачи qasync
+        # запускает вложенный цикл событий
+        asyncio.ensure_future(
+            self.save_test_to_db(name_test, teacher_name, tag_counts)
+        )
 
-                # Удаляем старые теги
-                session.execute(
-                    delete(TagsOrm).where(TagsOrm.test_id == self.test_id)
+    async def save_test_to_db(self, name_test, teacher_name, tag_counts):
+        # Проверяем, существует ли уже тест с таким названием (только для нового теста)
+        if not self.test_id:
+            try:
+                with busy(self.save_test_btn):
+                    name_taken = await test_name_exists(name_test)
+            except Exception as e:
+                show_message(
+                    self,
+                    QtWidgets.QMessageBox.Critical,
+                    "Ошибка",
+                    f"Не удалось проверить название теста: {e}",
                 )
+                return
+            if name_taken:
+                show_message(
+                    self,
+                    QtWidgets.QMessageBox.Warning,
+                    "Ошибка",
+                    f"Тест с названием '{name_test}' уже существует. Пожалуйста, выберите другое название.",
+                )
+                return
 
-                # Обновляем информацию о тесте
-                test = session.get(TestsOrm, self.test_id)
-                test.name_test = name_test
-                test.teacher = teacher_name
-                session.flush()
-                test_id = self.test_id
-            else:
-                # Создаем новый тест
-                new_test = TestsOrm(name_test=name_test, teacher=teacher_name)
-                session.add(new_test)
-                session.flush()  # Чтобы получить id теста
-                test_id = new_test.id
-
-            # --- Сохраняем теги ---
-            tags_map = {}  # {tag_name: TagsOrm}
-            for tag_name, count in tag_counts.items():
-                tag_obj = TagsOrm(
-                    name=tag_name,
-                    count=count,
-                    test_id=test_id,
+        questions, keys = self.question_model.edited_questions()
+        try:
+            with busy(self.save_test_btn):
+                await save_test(
+                    self.test_id,
+                    name_test,
+                    teacher_name,
+                    tag_counts,
+                    questions,
+                    keys,
+                    self.original_questions,
+                    self.deleted_keys,
                 )
-                session.add(tag_obj)
-                tags_map[tag_name] = tag_obj
-            session.flush()  # Получаем id тегов
-
-            # --- Сохраняем вопросы ---
-            for q_html, q_type, q_answer, q_tag in self.questions:
-                tag_name = q_tag or "Без тэга"
-                tag_obj = tags_map.get(tag_name)
-
-                if q_type == "Ввод строки":
-                    question = QuestionsInputStringOrm(
-                        test_id=test_id,
-                        question=q_html,
-                        answers=q_answer,
-                        tag_id=tag_obj.id if tag_obj else None,
-                    )
-                    session.add(question)
+        except Exception as e:
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Critical,
+                "Ошибка",
+                f"Не удалось сохранить тест: {e}",
+            )
+            return
 
-                elif q_type == "Выбор правильн(ого/ых) ответов":
-                    question = QuestionsCheckBoxOrm(
-                        test_id=test_id,
-                        question=q_html,
-                        tag_id=tag_obj.id if tag_obj else None,
-                    )
-                    session.add(question)
-                    session.flush()  # Получаем id вопроса
-
-                    # создаем ответы
-                    answers = [
-                        AnswersCheckBoxOrm(
-                            text=text, is_correct=True, question_id=question.id
-                        )
-                        for text in q_answer[0]
-                    ] + [
-                        AnswersCheckBoxOrm(
-                            text=text,
-                            is_correct=False,
-                            question_id=question.id,
-                        )
-                        for text in q_answer[1]
-                    ]
-                    session.add_all(answers)
-
-                elif q_type == "Упорядочивание":
-                    question = QuestionsReplacementOrm(
-                        test_id=test_id,
-                        question=q_html,
-                        tag_id=tag_obj.id if tag_obj else None,
-                    )
-                    session.add(question)
-                    session.flush()  # Получаем id вопроса
-
-                    answers = [
-                        AnswersReplacementOrm(
-                            text=q_answer[i],
-                            number_in_answer=i + 1,
-                            question_id=question.id,
-                        )
-                        for i in range(len(q_answer))
-                    ]
-                    session.add_all(answers)
-
-            session.commit()
-
-        QtWidgets.QMessageBox.information(
-            self,
+        self.comeback_startmenu()
+        # Редактор уже закрыт — сообщение показывается над стартовым окном
+        show_message(
+            self.window,
+            QtWidgets.QMessageBox.Information,
             "Успех",
             f"Тест '{name_test}' успешно {'сохранен' if self.test_id else 'создан'}!",
         )
-        self.comeback_startmenu()
 
     # Загрузка существущего теста
-    def load_existing_test(self):
-        """Загрузка вопросов существующего теста"""
-        with session_sync_factory() as session:
-            # Загрузка вопросов разных типов
-            input_string_questions = session.scalars(
-                select(QuestionsInputStringOrm).where(
-                    QuestionsInputStringOrm.test_id == self.test_id
-                )
-            ).all()
-
-            checkbox_questions = session.scalars(
-                select(QuestionsCheckBoxOrm).where(
-                    QuestionsCheckBoxOrm.test_id == self.test_id
-                )
-            ).all()
-
-            replacement_questions = session.scalars(
-                select(QuestionsReplacementOrm).where(
-                    QuestionsReplacementOrm.test_id == self.test_id
-                )
-            ).all()
-
-            # Загрузка всех тегов для этого теста
-            tags = session.scalars(
-                select(TagsOrm).where(TagsOrm.test_id == self.test_id)
-            ).all()
-            tags_dict = {tag.id: tag for tag in tags}  # Словарь тегов по id
-
-            # Сбрасываем счетчик тегов и начинаем подсчет заново
-            self.unique_tag = {}
-
-            # Обработка вопросов с вводом строки
-            for question in input_string_questions:
-                tag_name = "Без тэга"
-                if question.tag_id and question.tag_id in tags_dict:
-                    tag_name = tags_dict[question.tag_id].name
-                self.unique_tag[tag_name] = (
-                    self.unique_tag.get(tag_name, 0) + 1
-                )
-
-                self.questions.append(
-                    (
-                        question.question,
-                        "Ввод строки",
-                        question.answers,
-                        tag_name if tag_name != "Без тэга" else None,
-                    )
-                )
-                item_text = f"{tag_name} — {question.question[:50]}..."
-                self.question_list.addItem(item_text)
-
-            # Обработка вопросов с выбором ответов
-            for question in checkbox_questions:
-                tag_name = "Без тэга"
-                if question.tag_id and question.tag_id in tags_dict:
-                    tag_name = tags_dict[question.tag_id].name
-                self.unique_tag[tag_name] = (
-                    self.unique_tag.get(tag_name, 0) + 1
-                )
-
-                # Загрузка правильных и неправильных ответов
-                correct_answers = session.scalars(
-                    select(AnswersCheckBoxOrm.text).where(
-                        AnswersCheckBoxOrm.question_id == question.id,
-                        AnswersCheckBoxOrm.is_correct == True,
-                    )
-                ).all()
-
-                wrong_answers = session.scalars(
-                    select(AnswersCheckBoxOrm.text).where(
-                        AnswersCheckBoxOrm.question_id == question.id,
-                        AnswersCheckBoxOrm.is_correct == False,
-                    )
-                ).all()
-
-                self.questions.append(
-                    (
-                        question.question,
-                        "Выбор правильн(ого/ых) ответов",
-                        [list(correct_answers), list(wrong_answers)],
-                        tag_name if tag_name != "Без тэга" else None,
-                    )
-                )
-                item_text = f"{tag_name} — {question.question[:50]}..."
-                self.question_list.addItem(item_text)
-
-            # Обработка вопросов с упорядочиванием
-            for question in replacement_questions:
-                tag_name = "Без тэга"
-                if question.tag_id and question.tag_id in tags_dict:
-                    tag_name = tags_dict[question.tag_id].name
-                self.unique_tag[tag_name] = (
-                    self.unique_tag.get(tag_name, 0) + 1
-                )
+    async def load_existing_test(self):
+        """Загрузка списка вопросов существующего теста"""
+        # Только ключи, теги и краткий текст — без HTML и изображений
+        try:
+            with busy(self.save_test_btn):
+                self.test_info = await get_test_info(self.test_id)
+                summaries = await load_editor_summaries(self.test_id)
+        except Exception as e:
+            show_message(
+                self,
+                QtWidgets.QMessageBox.Critical,
+                "Ошибка",
+                f"Не удалось загрузить тест: {e}",
+            )
+            return
 
-                # Загрузка ответов в правильном порядке
-                answers = session.scalars(
-                    select(AnswersReplacementOrm.text)
-                    .where(AnswersReplacementOrm.question_id == question.id)
-                    .order_by(AnswersReplacementOrm.number_in_answer)
-                ).all()
-
-                self.questions.append(
-                    (
-                        question.question,
-                        "Упорядочивание",
-                        list(answers),
-                        tag_name if tag_name != "Без тэга" else None,
-                    )
-                )
-                item_text = f"{tag_name} — {question.question[:50]}..."
-                self.question_list.addItem(item_text)
+        # Сбрасываем счетчик тегов и начинаем подсчет заново
+        self.unique_tag = {}
+
+        rows = []
+        for item in summaries:
+            tag_name = item.tag or "Без тэга"
+            self.unique_tag[tag_name] = self.unique_tag.get(tag_name, 0) + 1
+            rows.append(
+                {
+                    "key": item.key,
+                    "tag": item.tag,
+                    "summary": item.summary,
+                    "entry": None,  # загрузится при открытии вопроса
+                }
+            )
+        self.question_model.set_rows(rows)
 
     # Возвращение в главное меню
     def comeback_startmenu(self):
         # Получаем родительское окно (StartWindow) чтобы узнать тип пользователя
         self.window = StartWindow(is_teacher=True)
-        self.window.load_tests()
         self.window.show()
         self.close()
 
@@ -1764,15 +2133,21 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
         id_test: int,
         test_name: str,
         start_window: StartWindow,
+        questions: list,
+        attempt_writer: AttemptWriter = None,
         parent=None,
     ):
         super().__init__(parent)
 
         self.id_test = id_test
         self.last_window = start_window
+        self.attempt_writer = attempt_writer
+        if attempt_writer is not None:
+            attempt_writer.start_checkpoints()
 
         self.true_answer: int = 0
         self.current_index: int = 0
+        self.current_question = None
         self.do_question: int = 0
 
         self.setWindowTitle("Прохождение теста")
@@ -1783,12 +2158,14 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
         header.setStyleSheet("font-size: 16pt;")
         main_layout.addWidget(header)
 
-        # Загружаем список вопросов (а не генератор!)
-        self.questions = self.get_questions()
+        # Вопросы загружаются до открытия окна (StartWindow.open_test_window)
+        self.questions = questions
         self.limit = len(self.questions)
 
         # Список для контроля отвеченных и не отвеченных вопросов
         self.not_look_question = [True] * self.limit
+        # Незавершённый выбор студента по каждому вопросу (None — не трогал)
+        self.answer_states = [None] * self.limit
 
         down_main_layout = QtWidgets.QHBoxLayout()
         self.question_grid = QuestionGrid(total_questions=self.limit, cols=3)
@@ -1801,7 +2178,7 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
         # Правая часть
         self.right_layout = QtWidgets.QVBoxLayout()
 
-        self.question_text_browser = QtWidgets.QTextBrowser()
+        self.question_text_browser = ImageTextBrowser()
         self.question_text_browser.setOpenExternalLinks(False)
         self.question_text_browser.setStyleSheet(
             """
@@ -1821,6 +2198,18 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
         self.answer = QtWidgets.QVBoxLayout()
         self.right_layout.addLayout(self.answer)
 
+        # По одному набору виджетов ответа на тип вопроса на всё окно
+        self.answer_pools = {
+            CHECK_BOX: CheckBoxAnswers(),
+            REPLACEMENT: ReplacementAnswers(self.handle_replacement_click),
+            INPUT_STRING: InputStringAnswer(),
+        }
+        self.answer_stack = QtWidgets.QStackedWidget()
+        for pool in self.answer_pools.values():
+            self.answer_stack.addWidget(pool)
+        self.answer.addWidget(self.answer_stack)
+        self.replacement_order = []
+
         self.navigation_on_questions = NavigationOnQuestion()
         self.right_layout.addWidget(self.navigation_on_questions)
         self.navigation_on_questions.btn_next_question.clicked.connect(
@@ -1843,11 +2232,22 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
         if not self.not_look_question[self.current_index]:
             return
 
-        if self.check_answer():
+        answer_user = self.get_user_answers()
+        is_correct = self.check_answer(answer_user)
+        if is_correct:
             self.true_answer += 1
 
+        if self.attempt_writer is not None:
+            self.attempt_writer.record(
+                self.current_question["type"],
+                self.current_question["id"],
+                answer_user,
+                is_correct,
+            )
+
         self.not_look_question[self.current_index] = False
         self.question_grid.set_button_status(self.current_index, "Отвечен")
+        self.answer_stack.currentWidget().setEnabled(False)
 
         # блокируем кнопку "ответить" сразу после ответа
         self.navigation_on_questions.btn_reply_question.setEnabled(False)
@@ -1868,8 +2268,8 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
         self.navigation_on_questions.btn_next_question.setEnabled(False)
         self.navigation_on_questions.btn_end_test.setEnabled(True)
 
-    @QtCore.pyqtSlot()
-    def end_test(self):
+    @asyncSlot()
+    async def end_test(self):
         clear_layout(self.right_layout)
         self.right_layout.addWidget(
             QtWidgets.QLabel(
@@ -1883,65 +2283,40 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
 
         self.right_layout.addWidget(btn_comeback_startmenu)
 
-    def get_questions(self):
-        with session_sync_factory() as session:
-            questions = []
-
-            input_questions = session.scalars(
-                select(QuestionsInputStringOrm).where(
-                    QuestionsInputStringOrm.test_id == self.id_test
-                )
-            ).all()
-
-            for q in input_questions:
-                questions.append(
-                    {
-                        "question": q.question,
-                        "answer": q.answers,
-                        "type": "QuestionsInputString",
-                        "id": q.id,
-                    }
-                )
-
-            checkbox_questions = session.scalars(
-                select(QuestionsCheckBoxOrm)
-                .where(QuestionsCheckBoxOrm.test_id == self.id_test)
-                .options(selectinload(QuestionsCheckBoxOrm.answers))
-            ).all()
-
-            for q in checkbox_questions:
-                questions.append(
-                    {
-                        "question": q.question,
-                        "answer": q.answers,
-                        "type": "QuestionsCheckBox",
-                        "id": q.id,
-                    }
-                )
+        if self.attempt_writer is None:
+            return
 
-            replacement_questions = session.scalars(
-                select(QuestionsReplacementOrm)
-                .where(QuestionsReplacementOrm.test_id == self.id_test)
-                .options(selectinload(QuestionsReplacementOrm.answers))
-            ).all()
+        # Результат показан сразу, ответы записываются одной пачкой
+        save_status = QtWidgets.QLabel("Сохранение результата...")
+        self.right_layout.addWidget(save_status)
+        try:
+            await self.attempt_writer.finish()
+            save_status.setText("Результат сохранён")
+        except Exception as e:
+            print(f"❌ Ошибка сохранения результата: {e}")
+            save_status.setText("Не удалось сохранить результат")
 
-            for q in replacement_questions:
-                sorted_answers = sorted(
-                    q.answers, key=lambda x: x.number_in_answer
-                )
-                questions.append(
-                    {
-                        "question": q.question,
-                        "answer": sorted_answers,
-                        "type": "QuestionsReplacement",
-                        "id": q.id,
-                    }
-                )
+    @staticmethod
+    def get_questions(payload):
+        """Вопросы выборки в перемешанном порядке"""
+        questions = [
+            {
+                "question": q.question,
+                "answer": q.answer if q.type == INPUT_STRING else q.answers,
+                "type": q.type,
+                "id": q.id,
+                # проверка ответа собирается один раз при загрузке теста
+                "grader": compile_grader(
+                    q.type, q.answer if q.type == INPUT_STRING else q.answers
+                ),
+            }
+            for q in payload.questions
+        ]
 
-            import random
+        import random
 
-            random.shuffle(questions)
-            return questions
+        random.shuffle(questions)
+        return questions
 
     def load_question(self, index: int):
         if index < 0 or index >= len(self.questions):
@@ -1949,6 +2324,12 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
 
         self.question_grid.reset_selected()
 
+        # Запоминаем выбор на вопросе, с которого уходим
+        if self.current_question is not None:
+            self.answer_states[self.current_index] = self.answer_pools[
+                self.current_question["type"]
+            ].state()
+
         self.current_index = index
         self.current_question = self.questions[index]
 
@@ -1956,141 +2337,66 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
 
         self.question_text_browser.setHtml(self.current_question["question"])
 
-        clear_layout(self.answer)
         self.add_widgets_answer()
 
         if not self.not_look_question[index]:
             self.navigation_on_questions.btn_reply_question.setEnabled(False)
         elif self.current_question["type"] == "QuestionsReplacement":
-            self.navigation_on_questions.btn_reply_question.setEnabled(False)
+            self.navigation_on_questions.btn_reply_question.setEnabled(
+                self.check_replacement_ready()
+            )
         else:
             # для остальных типов активируем сразу
             self.navigation_on_questions.btn_reply_question.setEnabled(True)
 
     # Загрузка в окно с вопросом подходящий под вопрос виджет
     def add_widgets_answer(self):
-        clear_layout(self.answer)  # Очищаем предыдущие ответы
-
-        if self.current_question["type"] == "QuestionsCheckBox":
-            # Для чекбоксов answer содержит список объектов AnswersCheckBoxOrm
-            for answer_obj in self.current_question["answer"]:
-                checkbox = QtWidgets.QCheckBox(answer_obj.text)
-                self.answer.addWidget(checkbox)
-
-        elif self.current_question["type"] == "QuestionsReplacement":
-            self.replacement_order = []
-            self.current_question["replacement_buttons"] = []
-            self.true_replacement = []
-
-            # Для упорядочивания answer содержит список объектов AnswersReplacementOrm
-            for answer_obj in self.current_question["answer"]:
-                hbox = QtWidgets.QHBoxLayout()
-
-                label = QtWidgets.QLabel(answer_obj.text)
-                self.true_replacement.append(answer_obj.number_in_answer)
-
-                label.setSizePolicy(
-                    QtWidgets.QSizePolicy.Expanding,
-                    QtWidgets.QSizePolicy.Preferred,
-                )
-
-                btn = QtWidgets.QPushButton("")
-                btn.setFixedSize(20, 20)
-                btn.setProperty("original_text", answer_obj.text)
-                btn.setStyleSheet("background-color: lightgray;")
-                btn.clicked.connect(
-                    lambda _, b=btn: self.handle_replacement_click(b)
-                )
-
-                hbox.addWidget(btn)
-                hbox.addWidget(label)
-                self.answer.addLayout(hbox)
-
-                self.current_question["replacement_buttons"].append(btn)
-
-        elif self.current_question["type"] == "QuestionsInputString":
-            # Для ввода строки создаем поле ввода
-            line_edit = QtWidgets.QLineEdit()
-            self.answer.addWidget(line_edit)
+        question_type = self.current_question["type"]
+        answers = self.current_question["answer"]
+        state = self.answer_states[self.current_index]
+
+        pool = self.answer_pools[question_type]
+        pool.bind(answers, state)
+        # Отвеченный вопрос показываем с ответом студента, но без правки
+        pool.setEnabled(self.not_look_question[self.current_index])
+
+        if question_type == REPLACEMENT:
+            self.replacement_order = pool.state()
+
+        # Высота области ответа — по текущему виджету, а не по самому
+        # большому из стопки
+        for other in self.answer_pools.values():
+            policy = (
+                QtWidgets.QSizePolicy.Preferred
+                if other is pool
+                else QtWidgets.QSizePolicy.Ignored
+            )
+            other.setSizePolicy(policy, policy)
+        self.answer_stack.setCurrentWidget(pool)
 
     # Получение ответа пользователя в зависимости от типа вопроса
     def get_user_answers(self):
-        checked_answers = []
-
-        if self.current_question["type"] == "QuestionsCheckBox":
-            for i in range(self.answer.count()):
-                item = self.answer.itemAt(i)
-                checkbox = item.widget()
-                if (
-                    isinstance(checkbox, QtWidgets.QCheckBox)
-                    and checkbox.isChecked()
-                ):
-                    checked_answers.append(checkbox.text())
-
-        elif self.current_question["type"] == "QuestionsReplacement":
-            for i in range(self.answer.count()):
-                item = self.answer.itemAt(i)
-                if item and item.itemAt(0):  # Проверяем существование элемента
-                    button_item = item.itemAt(0)
-                    if button_item and button_item.widget():
-                        button = button_item.widget()
-                        if (
-                            button.text().strip()
-                        ):  # Если кнопка имеет текст (номер)
-                            checked_answers.append(int(button.text()))
-
-        elif self.current_question["type"] == "QuestionsInputString":
-            if self.answer.count() > 0:
-                item = self.answer.itemAt(0)
-                if item and item.widget():
-                    return item.widget().text()
-
-        return checked_answers
-
-    # Проверка выбранных оветов пользователем
-    def check_answer(self):
-        answer_user = self.get_user_answers()
+        question_type = self.current_question["type"]
+        state = self.answer_pools[question_type].state()
 
-        if self.current_question["type"] == "QuestionsCheckBox":
-            # Для чекбоксов проверяем соответствие выбранных ответов
-            user_answers_set = set(answer_user)
+        if question_type == INPUT_STRING:
+            return state
 
-            for answer_obj in self.current_question["answer"]:
-                # Если ответ правильный, но не выбран - ошибка
-                if (
-                    answer_obj.is_correct
-                    and answer_obj.text not in user_answers_set
-                ):
-                    return False
-                # Если ответ неправильный, но выбран - ошибка
-                if (
-                    not answer_obj.is_correct
-                    and answer_obj.text in user_answers_set
-                ):
-                    return False
-            return True
+        # Выбор — id отмеченных вариантов,
+        # упорядочивание — id вариантов в выбранном порядке
+        answers = self.current_question["answer"]
+        return [answers[position].id for position in state]
 
-        elif self.current_question["type"] == "QuestionsReplacement":
-            # Для упорядочивания сравниваем порядок
-            result = self.true_replacement == answer_user
-            return result
-
-        elif self.current_question["type"] == "QuestionsInputString":
-            # Для ввода строки сравниваем текст (без учета регистра и пробелов)
-            correct_answer = self.current_question["answer"]
-            user_answer = answer_user.strip()
-            result = user_answer.lower() == correct_answer.lower()
-            return result
-
-        return False
+    # Проверка выбранных оветов пользователем
+    def check_answer(self, answer_user):
+        return self.current_question["grader"].grade(answer_user)
 
     def check_replacement_ready(self):
         if self.current_question["type"] == "QuestionsReplacement":
-            # Все кнопки должны быть нажаты (т.е. текст не пустой)
-            for btn in self.current_question["replacement_buttons"]:
-                if btn.text().strip() == "":
-                    return False
-            return True
+            # Все строки должны получить номер
+            return len(self.replacement_order) == len(
+                self.current_question["answer"]
+            )
         return True
 
     # Возвращение в главное меню
@@ -2099,142 +2405,11 @@ class QuestionWindow(QtWidgets.QFrame, QuestionReplacementMixin):
         self.last_window.show()
         self.close()
 
-
-async def setup_database():
-    async with get_async_engine().begin() as conn:
-        await conn.execute(text("DROP SCHEMA public CASCADE"))
-        await conn.execute(text("CREATE SCHEMA public"))
-        await conn.run_sync(Base.metadata.create_all)
-    await get_async_engine().dispose()
-
-
-async def insert_data_database():
-    async with session_async_factory() as session:
-        answers1 = [
-            {
-                "text": "смещенной",
-                "is_corrected": False,
-            },
-            {
-                "text": "несмещенной",
-                "is_corrected": True,
-            },
-            {
-                "text": "состоятельной",
-                "is_corrected": True,
-            },
-            {
-                "text": "несостоятельной",
-                "is_corrected": False,
-            },
-            {
-                "text": "доверительной",
-                "is_corrected": False,
-            },
-            {
-                "text": "нормальной",
-                "is_corrected": False,
-            },
-        ]
-        answers2 = [
-            {
-                "text": "число опытов мало",
-                "is_corrected": True,
-            },
-            {
-                "text": "число опытов велика",
-                "is_corrected": False,
-            },
-            {
-                "text": "заданы большие (>50) значения случайной величины",
-                "is_corrected": False,
-            },
-            {
-                "text": "заданы маленькие (<1 значения случайной величины)",
-                "is_corrected": False,
-            },
-        ]
-        answers3 = [
-            "Строят прямые, уравнения которых получаются в результате замены в ограничениях знаков неравенств на знаки точных равенств",
-            "Находят полуплоскости, определяемые каждым из ограничений задачи",
-            "Находят многоугольник решений",
-            "Строят вектор",
-            "Строят прямую, проходящую через многоугольник решений",
-            "Передвигают прямую в направлении веткора, в результате чего-либо находят точку"
-            " (точки), в которой целвая функция принимает максимальное значение, "
-            "либо устанавливают неограниченность сверху функции нам ножестве планов",
-            "Определяют координаты точки максимума функции и вычисляют значение целевой функции"
-            "в этой точке",
-        ]
-
-        # Создаем тест
-        test = TestsOrm(
-            name_test="Первый тест",
-            teacher="Поляков",
-        )
-        session.add(test)
-        await session.flush()  # Получаем test.id
-
-        # Создаем теги и связываем их с тестом
-        tag1 = TagsOrm(name="Статистика", count=2, test_id=test.id)
-        tag2 = TagsOrm(
-            name="Линейное программирование", count=1, test_id=test.id
-        )
-        session.add_all([tag1, tag2])
-        await session.flush()  # Получаем tag.id
-
-        # Создаем вопросы и связываем их с тегами
-        question1 = QuestionsCheckBoxOrm(
-            question="Выбрать все правильные варинат ответа\n"
-            "Оценка параметра рассположения должна быть ______",
-            test_id=test.id,
-            tag_id=tag1.id,  # Связываем вопрос с тегом через tag_id
-        )
-        session.add(question1)
-        await session.flush()  # Получаем question1.id
-
-        # Добавляем ответы для question1
-        for ans in answers1:
-            answer = AnswersCheckBoxOrm(
-                text=ans["text"],
-                is_correct=ans["is_corrected"],
-                question_id=question1.id,
-            )
-            session.add(answer)
-
-        question2 = QuestionsCheckBoxOrm(
-            question="Выбрать правильный вариант ответа.\n"
-            "Для оценки параметра распределения случайной величины"
-            "используют доверительные интервалы, если",
-            test_id=test.id,
-            tag_id=tag1.id,  # Связываем вопрос с тегом через tag_id
-        )
-        session.add(question2)
-        await session.flush()  # Получаем question2.id
-
-        # Добавляем ответы для question2
-        for ans in answers2:
-            answer = AnswersCheckBoxOrm(
-                text=ans["text"],
-                is_correct=ans["is_corrected"],
-                question_id=question2.id,
-            )
-            session.add(answer)
-
-        question3 = QuestionsReplacementOrm(
-            question="Последовательность решения задачи линейного "
-            "программирования на основе ее геометрической интерпретации",
-            test_id=test.id,
-            tag_id=tag2.id,  # Связываем вопрос с тегом через tag_id
-        )
-        session.add(question3)
-        await session.flush()  # Получаем question3.id
-
-        # Добавляем ответы для question3
-        for i, ans in enumerate(answers3, 1):
-            answer = AnswersReplacementOrm(
-                text=ans, number_in_answer=i, question_id=question3.id
-            )
-            session.add(answer)
-
-        await session.commit()
+    def closeEvent(self, event):
+        # Окно закрыто с несохранёнными ответами — сохраняем то, что успели
+        writer = self.attempt_writer
+        if writer is not None:
+            writer.stop_checkpoints()
+            if writer.has_pending:
+                writer.flush_in_background()
+        super().closeEvent(event)
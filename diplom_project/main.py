@@ -1,6 +1,10 @@
 import asyncio
 import os
 import sys
+import time
+
+# Момент запуска — для замера времени до появления окна входа
+STARTED_AT = time.perf_counter()
 
 sys.path.append(os.path.dirname(__file__))
 
@@ -12,19 +16,18 @@ async def init_database():
 
         # Импортируем и инициализируем БД через database.py
         from database import get_async_engine, init_databases
-        from models import Base
-        from sqlalchemy import text
-
-        # Инициализируем движки БД
-        init_databases()
+        from migrations import ensure_schema
 
-        # Получаем асинхронный движок
-        async_engine = get_async_engine()
+        # Инициализируем движки БД (расшифровка конфигурации — в потоке,
+        # чтобы не блокировать окно входа)
+        await asyncio.get_running_loop().run_in_executor(
+            None, init_databases
+        )
 
-        # Создаем таблицы
-        async with async_engine.begin() as conn:
-            await conn.execute(text("CREATE SCHEMA IF NOT EXISTS public"))
-            await conn.run_sync(Base.metadata.create_all)
+        # Схема создаётся/обновляется только если её версия устарела,
+        # существующие данные не удаляются
+        if await ensure_schema(get_async_engine()):
+            print("✅ Схема базы данных создана/обновлена")
 
         print("✅ База данных инициализирована")
 
@@ -33,32 +36,30 @@ async def init_database():
         raise
 
 
-async def setup_initial_data():
-    """Настройка начальных данных"""
+async def connect_database(window):
+    """Подключение к БД в фоне, пока пользователь видит окно входа"""
     try:
-        from login_window import insert_data_database, setup_database
-
-        print("🔄 Настройка начальных данных...")
-        await setup_database()
-        await insert_data_database()
-        print("✅ Начальные данные добавлены")
+        await init_database()
+    except Exception:
+        window.set_database_ready(False, "Нет подключения к базе данных")
+        return
 
-    except Exception as e:
-        print(f"❌ Ошибка настройки данных: {e}")
-        raise
+    # Создаем учителя по умолчанию
+    await window.create_default_teacher()
+    window.set_database_ready(True)
 
 
-async def main():
-    try:
-        # 1. Сначала инициализируем базу данных
-        await init_database()
+def report_startup_time():
+    elapsed = (time.perf_counter() - STARTED_AT) * 1000
+    print(f"🚀 Окно входа показано за {elapsed:.0f} мс")
 
-        # 2. Затем настраиваем начальные данные
-        await setup_initial_data()
 
-        # 3. Только ПОСЛЕ этого импортируем Qt и создаем приложение
+def main():
+    try:
+        # Сначала показываем окно входа, БД подключается уже после
         from login_window import LoginWindow
         from PyQt5 import QtWidgets
+        from PyQt5.QtCore import QTimer
         from qasync import QEventLoop
 
         app = QtWidgets.QApplication(sys.argv)
@@ -68,17 +69,23 @@ async def main():
         # Создаем окно логина
         window = LoginWindow()
         window.show()
+        QTimer.singleShot(0, report_startup_time)
+
+        with loop:
+            loop.create_task(connect_database(window))
+            loop.run_forever()
 
-        # Создаем учителя по умолчанию
-        window.create_default_teacher()
+            # Окна закрыты — дописываем ответы, сохранение которых
+            # началось при закрытии окна теста, и закрываем соединения с БД
+            from attempt_writer import wait_pending_flushes
+            from database import close_databases
 
-        print("🚀 Приложение запущено")
-        await loop.run_forever()
+            loop.run_until_complete(wait_pending_flushes())
+            loop.run_until_complete(close_databases())
 
     except Exception as e:
         print(f"❌ Критическая ошибка при запуске: {e}")
 
 
 if __name__ == "__main__":
-    # Простой запуск без сложных проверок
-    asyncio.run(main())
+    main()
@@ -0,0 +1,410 @@
+# migrations.py
+import hashlib
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+from models import Base, SchemaVersionOrm, TestsOrm
+from sqlalchemy import UniqueConstraint, insert, inspect, select, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+# Ключ advisory lock, под которым выполняются миграции
+MIGRATION_LOCK_KEY = 0x7465737463656E74
+
+# Сколько клиент ждёт, пока миграцию выполняет другой клиент
+MIGRATION_LOCK_TIMEOUT = "60s"
+
+
+class Migration(NamedTuple):
+    """
+    Шаг миграции. Применённые шаги менять нельзя — это проверяется
+    по контрольной сумме. Шаги после baseline должны быть идемпотентными
+    (IF NOT EXISTS): в новой базе baseline уже создаёт актуальную схему.
+    Контрольная сумма baseline не зависит от моделей (create_all), поэтому
+    изменения моделей ловит не она, а сверка схемы с моделями
+    (schema_drift) при изменении отпечатка моделей (models_checksum).
+    """
+
+    version: int
+    name: str
+    statements: Tuple[str, ...] = ()
+    create_all: bool = False
+
+    @property
+    def checksum(self):
+        digest = hashlib.sha256(self.name.encode())
+        for statement in self.statements:
+            digest.update(b"\0" + statement.encode())
+        return digest.hexdigest()
+
+
+def _summary_statements(table):
+    """
+    Колонка summary и её заполнение для уже сохранённых вопросов:
+    текст после <body>, без тегов, со схлопнутыми пробелами (200 символов).
+    Новые значения вычисляет question_saver.question_summary.
+    """
+    plain_text = (
+        "regexp_replace(regexp_replace(regexp_replace("
+        "question, '^.*<body[^>]*>', ''), "
+        "'<img[^>]*>', ' [изображение] ', 'g'), "
+        "'<[^>]*>', ' ', 'g')"
+    )
+    for entity, char in (
+        ("&nbsp;", " "),
+        ("&lt;", "<"),
+        ("&gt;", ">"),
+        ("&quot;", '"'),
+        ("&#39;", "''"),
+        ("&amp;", "&"),
+    ):
+        plain_text = f"replace({plain_text}, '{entity}', '{char}')"
+    plain_text = f"regexp_replace({plain_text}, '\\s+', ' ', 'g')"
+    return (
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS summary TEXT",
+        f"UPDATE {table} SET summary = left(btrim({plain_text}), 200) "
+        "WHERE summary IS NULL",
+    )
+
+
+# Упорядоченный список миграций
+MIGRATIONS = (
+    Migration(1, "baseline", create_all=True),
+    Migration(
+        2,
+        "foreign_key_indexes",
+        (
+            "CREATE INDEX IF NOT EXISTS ix_students_group_id "
+            "ON students (group_id)",
+            "CREATE INDEX IF NOT EXISTS ix_tags_test_id ON tags (test_id)",
+            "CREATE INDEX IF NOT EXISTS ix_questionscheckbox_test_id "
+            "ON questionscheckbox (test_id)",
+            "CREATE INDEX IF NOT EXISTS ix_questionscheckbox_tag_id "
+            "ON questionscheckbox (tag_id)",
+            "CREATE INDEX IF NOT EXISTS ix_questionsreplacement_test_id "
+            "ON questionsreplacement (test_id)",
+            "CREATE INDEX IF NOT EXISTS ix_questionsreplacement_tag_id "
+            "ON questionsreplacement (tag_id)",
+            "CREATE INDEX IF NOT EXISTS ix_questionsinputstring_test_id "
+            "ON questionsinputstring (test_id)",
+            "CREATE INDEX IF NOT EXISTS ix_questionsinputstring_tag_id "
+            "ON questionsinputstring (tag_id)",
+            "CREATE INDEX IF NOT EXISTS "
+            "ix_answerscheckbox_question_id_is_correct "
+            "ON answerscheckbox (question_id, is_correct)",
+            "CREATE INDEX IF NOT EXISTS "
+            "ix_answersreplacement_question_id_number_in_answer "
+            "ON answersreplacement (question_id, number_in_answer)",
+        ),
+    ),
+    Migration(
+        3,
+        "attempts_and_responses",
+        (
+            "CREATE TABLE IF NOT EXISTS attempts ("
+            "id SERIAL PRIMARY KEY, "
+            "student_id INTEGER NOT NULL "
+            "REFERENCES students (id) ON DELETE CASCADE, "
+            "test_id INTEGER NOT NULL "
+            "REFERENCES tests (id) ON DELETE CASCADE, "
+            "test_version INTEGER, "
+            "question_count INTEGER NOT NULL, "
+            "correct_count INTEGER NOT NULL DEFAULT 0, "
+            "started_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(), "
+            "finished_at TIMESTAMP WITHOUT TIME ZONE)",
+            "CREATE INDEX IF NOT EXISTS ix_attempts_student_id "
+            "ON attempts (student_id)",
+            "CREATE INDEX IF NOT EXISTS ix_attempts_test_id "
+            "ON attempts (test_id)",
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "id SERIAL PRIMARY KEY, "
+            "attempt_id INTEGER NOT NULL "
+            "REFERENCES attempts (id) ON DELETE CASCADE, "
+            "question_type VARCHAR NOT NULL, "
+            "question_id INTEGER NOT NULL, "
+            "answer JSON, "
+            "is_correct BOOLEAN NOT NULL, "
+            "answered_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+            "CONSTRAINT uq_responses_attempt_question "
+            "UNIQUE (attempt_id, question_type, question_id))",
+        ),
+    ),
+    Migration(
+        4,
+        "question_summaries",
+        _summary_statements("questionsinputstring")
+        + _summary_statements("questionscheckbox")
+        + _summary_statements("questionsreplacement"),
+    ),
+    Migration(
+        5,
+        "tests_version",
+        (
+            "ALTER TABLE tests ADD COLUMN IF NOT EXISTS "
+            "version INTEGER NOT NULL DEFAULT 1",
+        ),
+    ),
+)
+
+# Версия схемы, которую ожидает этот код
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+# Приведение таблицы schema_version из первых версий к текущему виду
+BOOTSTRAP_STATEMENTS = (
+    "ALTER TABLE schema_version ADD COLUMN IF NOT EXISTS name VARCHAR",
+    "ALTER TABLE schema_version ADD COLUMN IF NOT EXISTS checksum VARCHAR(64)",
+    "ALTER TABLE schema_version ADD COLUMN IF NOT EXISTS models_checksum "
+    "VARCHAR(64)",
+    "ALTER TABLE schema_version ADD COLUMN IF NOT EXISTS applied_at "
+    "TIMESTAMP WITHOUT TIME ZONE DEFAULT now()",
+)
+
+
+@lru_cache(maxsize=None)
+def models_checksum():
+    """Отпечаток схемы моделей: DDL всех таблиц и индексов (без БД)"""
+    dialect = postgresql.dialect()
+    digest = hashlib.sha256()
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        statements.append(CreateTable(table))
+        statements += [
+            CreateIndex(index)
+            for index in sorted(table.indexes, key=lambda index: index.name)
+        ]
+    for statement in statements:
+        digest.update(str(statement.compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+async def applied_migrations(engine):
+    """
+    ({версия: контрольная сумма}, {отпечатки моделей}) применённых
+    миграций, None — нет таблицы
+    """
+    try:
+        async with engine.connect() as conn:
+            rows = (
+                await conn.execute(
+                    select(
+                        SchemaVersionOrm.version,
+                        SchemaVersionOrm.checksum,
+                        SchemaVersionOrm.models_checksum,
+                    )
+                )
+            ).all()
+    except ProgrammingError:
+        # Таблицы schema_version ещё нет (или она старого вида)
+        return None
+    return (
+        {version: checksum for version, checksum, _ in rows},
+        {models for _, _, models in rows},
+    )
+
+
+def check_checksums(applied):
+    for migration in MIGRATIONS:
+        checksum = applied.get(migration.version)
+        if checksum is not None and checksum != migration.checksum:
+            raise RuntimeError(
+                f"Миграция {migration.version} ({migration.name}) "
+                "изменена после применения"
+            )
+
+
+def _migrate(conn):
+    """Применение недостающих миграций под advisory lock (в транзакции)"""
+    conn.execute(text(f"SET LOCAL lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'"))
+    # Остальные клиенты ждут здесь, пока первый не закончит миграцию
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"),
+        {"key": MIGRATION_LOCK_KEY},
+    )
+    conn.execute(text("CREATE SCHEMA IF NOT EXISTS public"))
+    SchemaVersionOrm.__table__.create(conn, checkfirst=True)
+    for statement in BOOTSTRAP_STATEMENTS:
+        conn.execute(text(statement))
+
+    known = {migration.version: migration for migration in MIGRATIONS}
+    for version in conn.scalars(
+        select(SchemaVersionOrm.version).where(
+            SchemaVersionOrm.checksum.is_(None)
+        )
+    ).all():
+        if version in known:
+            conn.execute(
+                update(SchemaVersionOrm)
+                .where(SchemaVersionOrm.version == version)
+                .values(
+                    name=known[version].name,
+                    checksum=known[version].checksum,
+                )
+            )
+
+    # Перечитываем под блокировкой: миграцию мог выполнить другой клиент
+    applied = dict(
+        conn.execute(
+            select(SchemaVersionOrm.version, SchemaVersionOrm.checksum)
+        ).all()
+    )
+    check_checksums(applied)
+
+    needs_demo_data = False
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        if migration.create_all:
+            Base.metadata.create_all(conn)
+            needs_demo_data = not conn.scalar(
+                select(select(TestsOrm.id).exists())
+            )
+        for statement in migration.statements:
+            conn.execute(text(statement))
+        conn.execute(
+            insert(SchemaVersionOrm).values(
+                version=migration.version,
+                name=migration.name,
+                checksum=migration.checksum,
+            )
+        )
+        print(f"✅ Применена миграция {migration.version}: {migration.name}")
+
+    # После миграций схема должна совпадать с моделями, иначе откатываем
+    drift = schema_drift(conn)
+    if drift:
+        raise RuntimeError(
+            "Схема БД не совпадает с моделями, нужна миграция: "
+            + "; ".join(drift)
+        )
+    conn.execute(
+        update(SchemaVersionOrm).values(models_checksum=models_checksum())
+    )
+    return needs_demo_data
+
+
+def _unique_sets(table):
+    uniques = {
+        frozenset(column.name for column in constraint.columns)
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint)
+    }
+    uniques |= {
+        frozenset([column.name]) for column in table.columns if column.unique
+    }
+    uniques |= {
+        frozenset(column.name for column in index.columns)
+        for index in table.indexes
+        if index.unique
+    }
+    return uniques
+
+
+def _foreign_keys(table):
+    return {
+        (
+            frozenset(fk.parent.name for fk in constraint.elements),
+            constraint.referred_table.name,
+            (constraint.ondelete or "").upper(),
+        )
+        for constraint in table.foreign_key_constraints
+    }
+
+
+def schema_drift(conn):
+    """
+    Расхождения БД с моделями: ["tests.version: нет колонки", ...].
+    create_all не меняет существующие таблицы, поэтому любое изменение
+    модели существующей таблицы (колонки, типы, NULL, индексы,
+    ограничения) должно сопровождаться своей миграцией.
+    """
+    inspector = inspect(conn)
+    drift = []
+    for table in Base.metadata.sorted_tables:
+        name = table.name
+        if not inspector.has_table(name):
+            drift.append(f"{name}: нет таблицы")
+            continue
+
+        db_columns = {
+            column["name"]: column for column in inspector.get_columns(name)
+        }
+        for column in table.columns:
+            db_column = db_columns.pop(column.name, None)
+            if db_column is None:
+                drift.append(f"{name}.{column.name}: нет колонки")
+                continue
+            db_type = db_column["type"]
+            if db_type._type_affinity is not column.type._type_affinity:
+                drift.append(
+                    f"{name}.{column.name}: тип {db_type}, "
+                    f"в модели {column.type}"
+                )
+            if db_column["nullable"] != column.nullable:
+                drift.append(
+                    f"{name}.{column.name}: nullable {db_column['nullable']}, "
+                    f"в модели {column.nullable}"
+                )
+        drift += [f"{name}.{column}: нет в модели" for column in db_columns]
+
+        db_indexes = {index["name"] for index in inspector.get_indexes(name)}
+        drift += [
+            f"{name}: нет индекса {index.name}"
+            for index in table.indexes
+            if index.name not in db_indexes
+        ]
+
+        db_uniques = {
+            frozenset(constraint["column_names"])
+            for constraint in inspector.get_unique_constraints(name)
+        } | {
+            frozenset(index["column_names"])
+            for index in inspector.get_indexes(name)
+            if index["unique"]
+        }
+        drift += [
+            f"{name}: нет уникальности ({', '.join(sorted(columns))})"
+            for columns in _unique_sets(table) - db_uniques
+        ]
+
+        db_foreign_keys = {
+            (
+                frozenset(fk["constrained_columns"]),
+                fk["referred_table"],
+                (fk["options"].get("ondelete") or "").upper(),
+            )
+            for fk in inspector.get_foreign_keys(name)
+        }
+        drift += [
+            f"{name}: внешний ключ ({', '.join(sorted(columns))}) -> "
+            f"{referred} ON DELETE {ondelete or 'NO ACTION'} не совпадает"
+            for columns, referred, ondelete in _foreign_keys(table)
+            - db_foreign_keys
+        ]
+    return drift
+
+
+async def ensure_schema(engine):
+    """
+    Проверка схемы при запуске: если все миграции применены и модели
+    не менялись — ничего не делаем (один запрос), иначе применяем
+    недостающие миграции, не трогая данные, и сверяем схему с моделями.
+    Демо-данные добавляются только в новую пустую базу.
+    """
+    state = await applied_migrations(engine)
+    if state is not None:
+        applied, checked_models = state
+        check_checksums(applied)
+        if checked_models == {models_checksum()} and all(
+            migration.version in applied for migration in MIGRATIONS
+        ):
+            return False
+
+    async with engine.begin() as conn:
+        needs_demo_data = await conn.run_sync(_migrate)
+
+    if needs_demo_data:
+        from demo_data import insert_data_database
+
+        await insert_data_database()
+    return True
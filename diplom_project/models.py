@@ -1,6 +1,16 @@
-from typing import Annotated, Optional
-
-from sqlalchemy import ForeignKey, Text
+from datetime import datetime
+from typing import Annotated, Any, Optional
+
+from sqlalchemy import (
+    JSON,
+    ForeignKey,
+    Index,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -17,6 +27,20 @@ class Base(DeclarativeBase):
     pass
 
 
+# ---- Применённые миграции схемы БД ----
+class SchemaVersionOrm(Base):
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[Optional[str]]
+    checksum: Mapped[Optional[str]] = mapped_column(String(64))
+    # отпечаток моделей, с которыми сверена схема (migrations.models_checksum)
+    models_checksum: Mapped[Optional[str]] = mapped_column(String(64))
+    applied_at: Mapped[Optional[datetime]] = mapped_column(
+        server_default=func.now()
+    )
+
+
 class GroupsOrm(Base):
     __tablename__ = "groups"
 
@@ -36,7 +60,9 @@ class StudentsOrm(Base):
     login: Mapped[str] = mapped_column(unique=True, nullable=False)
     password: Mapped[str] = mapped_column(nullable=False)
     full_name: Mapped[str]
-    group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"))
+    group_id: Mapped[int] = mapped_column(
+        ForeignKey("groups.id"), index=True
+    )
 
     group: Mapped["GroupsOrm"] = relationship(back_populates="students")
 
@@ -56,17 +82,23 @@ class QuestionBase(Base):
 
     id: Mapped[idpk]
     question: Mapped[str] = mapped_column(Text)
+    # текст вопроса без разметки для списка в редакторе (при сохранении)
+    summary: Mapped[Optional[str]] = mapped_column(Text)
 
     @declared_attr
     def tag_id(cls) -> Mapped[Optional[int]]:
         return mapped_column(
-            ForeignKey("tags.id", ondelete="SET NULL"), nullable=True
+            ForeignKey("tags.id", ondelete="SET NULL"),
+            nullable=True,
+            index=True,
         )
 
     @declared_attr
     def test_id(cls) -> Mapped[int]:
         return mapped_column(
-            ForeignKey("tests.id", ondelete="CASCADE"), nullable=False
+            ForeignKey("tests.id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
         )
 
 
@@ -79,7 +111,7 @@ class TagsOrm(Base):
     count: Mapped[int] = mapped_column(default=0)  # сколько вопросов выбрать
 
     test_id: Mapped[int] = mapped_column(
-        ForeignKey("tests.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("tests.id", ondelete="CASCADE"), nullable=False, index=True
     )
     test = relationship("TestsOrm", back_populates="tags")
 
@@ -102,6 +134,8 @@ class TestsOrm(Base):
     id: Mapped[idpk]
     name_test: Mapped[str] = mapped_column(unique=True)
     teacher: Mapped[str]
+    # версия содержимого, увеличивается при каждом сохранении теста
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
     tags: Mapped[list["TagsOrm"]] = relationship(
         back_populates="test", cascade="all, delete-orphan"
@@ -129,6 +163,14 @@ class QuestionsCheckBoxOrm(QuestionBase):
 
 class AnswersCheckBoxOrm(Base):
     __tablename__ = "answerscheckbox"
+    __table_args__ = (
+        # ответы вопроса (в т.ч. только правильные) и каскадное удаление
+        Index(
+            "ix_answerscheckbox_question_id_is_correct",
+            "question_id",
+            "is_correct",
+        ),
+    )
 
     id: Mapped[idpk]
     text: Mapped[str]
@@ -151,6 +193,14 @@ class QuestionsReplacementOrm(QuestionBase):
 
 class AnswersReplacementOrm(Base):
     __tablename__ = "answersreplacement"
+    __table_args__ = (
+        # ответы вопроса сразу в правильном порядке
+        Index(
+            "ix_answersreplacement_question_id_number_in_answer",
+            "question_id",
+            "number_in_answer",
+        ),
+    )
 
     id: Mapped[idpk]
     text: Mapped[str]
@@ -172,3 +222,62 @@ class QuestionsInputStringOrm(QuestionBase):
     answers: Mapped[str]
     test = relationship("TestsOrm", back_populates="questions_input_string")
     tag_obj = relationship("TagsOrm", back_populates="questions_input_string")
+
+
+# ---- Изображения вопросов (по хэшу содержимого) ----
+class ImagesOrm(Base):
+    __tablename__ = "images"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256
+    mime: Mapped[str]
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+# ---- Попытки прохождения тестов студентами ----
+class AttemptsOrm(Base):
+    __tablename__ = "attempts"
+
+    id: Mapped[idpk]
+    student_id: Mapped[int] = mapped_column(
+        ForeignKey("students.id", ondelete="CASCADE"), index=True
+    )
+    test_id: Mapped[int] = mapped_column(
+        ForeignKey("tests.id", ondelete="CASCADE"), index=True
+    )
+    test_version: Mapped[Optional[int]]  # версия теста на момент попытки
+    question_count: Mapped[int]
+    correct_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    started_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    # None — тест не завершён (сохранены только промежуточные ответы)
+    finished_at: Mapped[Optional[datetime]]
+
+    responses: Mapped[list["ResponsesOrm"]] = relationship(
+        back_populates="attempt", cascade="all, delete-orphan"
+    )
+
+
+# ---- Ответы студента на вопросы попытки ----
+class ResponsesOrm(Base):
+    __tablename__ = "responses"
+    __table_args__ = (
+        # повторная запись той же пачки ответов ничего не дублирует
+        UniqueConstraint(
+            "attempt_id",
+            "question_type",
+            "question_id",
+            name="uq_responses_attempt_question",
+        ),
+    )
+
+    id: Mapped[idpk]
+    attempt_id: Mapped[int] = mapped_column(
+        ForeignKey("attempts.id", ondelete="CASCADE")
+    )
+    # вопросы лежат в разных таблицах, поэтому тип + id без внешнего ключа
+    question_type: Mapped[str]
+    question_id: Mapped[int]
+    answer: Mapped[Any] = mapped_column(JSON, nullable=True)  # как ввёл
+    is_correct: Mapped[bool]
+    answered_at: Mapped[datetime]
+
+    attempt: Mapped["AttemptsOrm"] = relationship(back_populates="responses")
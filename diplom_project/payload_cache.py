@@ -0,0 +1,114 @@
+# payload_cache.py
+import sys
+import threading
+from collections import OrderedDict
+
+# Накладные расходы на одну запись (кортеж + NamedTuple), байт
+RECORD_OVERHEAD = 64
+
+
+def question_size(question):
+    """
+    Примерный объём вопроса в памяти: HTML со ссылками img:<hash>
+    (сами изображения хранятся отдельно, в image_cache) и ответы
+    """
+    size = RECORD_OVERHEAD + sys.getsizeof(question.question)
+    if question.answer is not None:
+        size += sys.getsizeof(question.answer)
+    for answer in question.answers:
+        size += RECORD_OVERHEAD + sys.getsizeof(answer.text)
+    return size
+
+
+class PayloadCache:
+    """
+    LRU-кэш вопросов, уже загруженных для студентов, с ограничением по
+    объёму в байтах. Выборку делает БД (build_sample_keys_query), из кэша
+    берутся только отобранные вопросы.
+    Ключ — (id теста, версия содержимого TestsOrm.version, type, id).
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # {(test_id, version, type, id): (вопрос, размер)}
+        self._entries = OrderedDict()
+        self._versions = {}  # {test_id: версия, вопросы которой в кэше}
+        self._lock = threading.Lock()
+
+    def get_questions(self, test_id, version, keys):
+        """Вопросы из кэша {(type, id): QuestionRecord}, без отсутствующих"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                cache_key = (test_id, version, *key)
+                entry = self._entries.get(cache_key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                found[key] = entry[0]
+        return found
+
+    def put_questions(self, test_id, version, questions):
+        """Сохранить вопросы версии теста (прежние версии удаляются)"""
+        with self._lock:
+            if self._versions.get(test_id) != version:
+                self._drop(test_id)
+                self._versions[test_id] = version
+
+            for question in questions:
+                key = (test_id, version, question.type, question.id)
+                size = question_size(question)
+                if size > self.max_bytes:
+                    continue
+                if key in self._entries:
+                    self.current_bytes -= self._entries.pop(key)[1]
+
+                while (
+                    self._entries
+                    and self.current_bytes + size > self.max_bytes
+                ):
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted_size
+                    self.evictions += 1
+
+                self._entries[key] = (question, size)
+                self.current_bytes += size
+
+    def invalidate(self, test_id):
+        """Удалить все версии теста (вызывается после сохранения теста)"""
+        with self._lock:
+            self._drop(test_id)
+            self._versions.pop(test_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _drop(self, test_id):
+        for key in [key for key in self._entries if key[0] == test_id]:
+            _, size = self._entries.pop(key)
+            self.current_bytes -= size
+
+
+# Общий кэш процесса
+payload_cache = PayloadCache()
@@ -0,0 +1,228 @@
+# query_stats.py
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from sqlalchemy import event
+
+# Каталог модулей приложения: место вызова запроса ищется среди них
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger("test_center.sql")
+
+
+class QueryRecord(NamedTuple):
+    statement: str
+    duration: float  # секунды
+    rows: int  # -1, если драйвер не сообщает число строк
+    call_site: str  # файл:строка функция в коде приложения
+    started_at: float
+
+
+def _is_app_frame(frame):
+    filename = frame.f_code.co_filename
+    return (
+        os.path.dirname(os.path.abspath(filename)) == APP_DIR
+        and os.path.basename(filename) != "query_stats.py"
+    )
+
+
+def _format_frame(frame):
+    return (
+        f"{os.path.basename(frame.f_code.co_filename)}:"
+        f"{frame.f_lineno} {frame.f_code.co_name}"
+    )
+
+
+def _task_frames():
+    """Кадры цепочки корутин текущей задачи asyncio (снаружи внутрь)"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return []
+    frames = []
+    coro = task.get_coro() if task is not None else None
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(
+            coro, "gi_frame", None
+        )
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(
+            coro, "gi_yieldfrom", None
+        )
+    return frames
+
+
+def call_site():
+    """
+    Ближайшее к запросу место в коде приложения. Запросы asyncpg
+    выполняются в отдельном greenlet, поэтому если в стеке нет кода
+    приложения, ищем его в цепочке корутин текущей задачи.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        if _is_app_frame(frame):
+            return _format_frame(frame)
+        frame = frame.f_back
+    for frame in reversed(_task_frames()):
+        if _is_app_frame(frame):
+            return _format_frame(frame)
+    return "?"
+
+
+class QueryStats:
+    """
+    Журнал последних SQL-запросов в памяти (кольцевой буфер): время
+    выполнения, число строк и место вызова. Параметры запросов не
+    сохраняются — среди них бывают пароли.
+    """
+
+    def __init__(self, max_records=1000, slow_ms=200):
+        self.records = deque(maxlen=max_records)
+        self.slow_ms = slow_ms
+        self.log_queries = False
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        """Подключение к engine (для AsyncEngine — его sync_engine)"""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def detach(self, engine):
+        event.remove(engine, "before_cursor_execute", self._before_execute)
+        event.remove(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        context._query_started_at = time.perf_counter()
+
+    def _after_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        started_at = getattr(context, "_query_started_at", None)
+        if started_at is None:
+            return
+        rows = getattr(cursor, "rowcount", -1)
+        record = QueryRecord(
+            statement=statement,
+            duration=time.perf_counter() - started_at,
+            rows=rows if rows is not None else -1,
+            call_site=call_site(),
+            started_at=started_at,
+        )
+        with self._lock:
+            self.records.append(record)
+
+        if record.duration * 1000 >= self.slow_ms:
+            logger.warning(
+                "Медленный запрос %.0f мс (%s): %s",
+                record.duration * 1000,
+                record.call_site,
+                " ".join(statement.split())[:500],
+            )
+        elif self.log_queries:
+            logger.info(
+                "%.1f мс, строк %s (%s): %s",
+                record.duration * 1000,
+                record.rows,
+                record.call_site,
+                " ".join(statement.split())[:500],
+            )
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.records)
+
+    def slowest(self, top=10):
+        """Самые медленные запросы"""
+        return sorted(self.snapshot(), key=lambda r: -r.duration)[:top]
+
+    def by_statement(self, top=10):
+        """Запросы с наибольшим суммарным временем: (SQL, число, сек)"""
+        totals = {}
+        for record in self.snapshot():
+            count, total = totals.get(record.statement, (0, 0.0))
+            totals[record.statement] = (count + 1, total + record.duration)
+        ranked = sorted(totals.items(), key=lambda item: -item[1][1])
+        return [(sql, count, total) for sql, (count, total) in ranked[:top]]
+
+    def n_plus_one(self, threshold=10, window=1.0):
+        """
+        Подозрения на N+1: один и тот же запрос из одного места
+        выполнен не меньше threshold раз за window секунд.
+        Возвращает [(место вызова, SQL, число повторов), ...].
+        """
+        windows = {}
+        peaks = {}
+        for record in self.snapshot():
+            key = (record.call_site, record.statement)
+            times = windows.setdefault(key, deque())
+            times.append(record.started_at)
+            while times[-1] - times[0] > window:
+                times.popleft()
+            peaks[key] = max(peaks.get(key, 0), len(times))
+
+        return sorted(
+            (
+                (site, statement, count)
+                for (site, statement), count in peaks.items()
+                if count >= threshold
+            ),
+            key=lambda item: -item[2],
+        )
+
+    def summary(self, top=10):
+        """Сводка по журналу запросов"""
+        records = self.snapshot()
+        return {
+            "queries": len(records),
+            "total_ms": sum(r.duration for r in records) * 1000,
+            "slowest": self.slowest(top),
+            "by_statement": self.by_statement(top),
+            "n_plus_one": self.n_plus_one(),
+        }
+
+    def report(self, top=10):
+        """Вывод сводки в консоль"""
+        summary = self.summary(top)
+        print(
+            f"📊 SQL: запросов {summary['queries']}, "
+            f"всего {summary['total_ms']:.0f} мс"
+        )
+        for record in summary["slowest"]:
+            print(
+                f"   {record.duration * 1000:7.1f} мс  {record.call_site}  "
+                f"{' '.join(record.statement.split())[:80]}"
+            )
+        for site, statement, count in summary["n_plus_one"]:
+            print(
+                f"⚠️  Возможно N+1: {count} одинаковых запросов из {site}: "
+                f"{' '.join(statement.split())[:80]}"
+            )
+
+
+# Журнал запросов процесса
+query_stats = QueryStats()
+
+
+def enable_query_log(path):
+    """Запись всех запросов (без параметров) в файл журнала"""
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    )
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    query_stats.log_queries = True
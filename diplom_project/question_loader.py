@@ -0,0 +1,370 @@
+# question_loader.py
+from typing import NamedTuple, Optional, Tuple
+
+from models import (
+    AnswersCheckBoxOrm,
+    AnswersReplacementOrm,
+    QuestionsCheckBoxOrm,
+    QuestionsInputStringOrm,
+    QuestionsReplacementOrm,
+    TagsOrm,
+)
+from sqlalchemy import (
+    Integer,
+    String,
+    Text,
+    cast,
+    column,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    union_all,
+    values,
+)
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+
+# Типы вопросов (совпадают с ключами "type", которые использует QuestionWindow)
+INPUT_STRING = "QuestionsInputString"
+CHECK_BOX = "QuestionsCheckBox"
+REPLACEMENT = "QuestionsReplacement"
+
+# Тег, которым помечаются вопросы без тега
+NO_TAG = "Без тэга"
+
+# Названия типов в редакторе тестов (QuestionEditor)
+EDITOR_TYPE_NAMES = {
+    INPUT_STRING: "Ввод строки",
+    CHECK_BOX: "Выбор правильн(ого/ых) ответов",
+    REPLACEMENT: "Упорядочивание",
+}
+
+QUESTION_MODELS = (
+    (QuestionsInputStringOrm, INPUT_STRING),
+    (QuestionsCheckBoxOrm, CHECK_BOX),
+    (QuestionsReplacementOrm, REPLACEMENT),
+)
+
+
+# ---- Неизменяемые записи теста (не привязаны к сессии) ----
+class AnswerRecord(NamedTuple):
+    id: int
+    text: str
+    is_correct: bool = False
+    number_in_answer: Optional[int] = None
+
+
+class QuestionRecord(NamedTuple):
+    id: int
+    type: str
+    question: str
+    tag_id: Optional[int]
+    tag_name: Optional[str]
+    answer: Optional[str]  # правильный ответ для ввода строки
+    answers: Tuple[AnswerRecord, ...]  # варианты для выбора/упорядочивания
+
+
+class TagRecord(NamedTuple):
+    id: int
+    name: str
+    count: int
+
+
+class TestPayload(NamedTuple):
+    test_id: int
+    questions: Tuple[QuestionRecord, ...]
+    tags: Tuple[TagRecord, ...]
+
+
+class QuestionSummary(NamedTuple):
+    """Строка списка вопросов в редакторе (без HTML и ответов)"""
+
+    key: Tuple[str, int]  # (type, id)
+    tag: Optional[str]  # None — вопрос без тега
+    summary: str
+
+
+def _answers_json(question_model, answer_model, columns, order_by):
+    """Коррелированный подзапрос: ответы вопроса одним JSON-массивом"""
+    return (
+        select(
+            func.json_agg(
+                aggregate_order_by(func.json_build_array(*columns), order_by),
+                type_=JSON,
+            )
+        )
+        .where(answer_model.question_id == question_model.id)
+        .scalar_subquery()
+    )
+
+
+def _picked_ids(picked, question_type):
+    return select(picked.c.id).where(picked.c.type == question_type)
+
+
+def _questions_union(test_id, picked=None):
+    """
+    Вопросы всех трёх типов одного теста в виде UNION ALL.
+    Если передан picked (CTE с type/id) — только отобранные вопросы.
+    """
+    checkbox_answers = _answers_json(
+        QuestionsCheckBoxOrm,
+        AnswersCheckBoxOrm,
+        (
+            AnswersCheckBoxOrm.id,
+            AnswersCheckBoxOrm.text,
+            AnswersCheckBoxOrm.is_correct,
+        ),
+        AnswersCheckBoxOrm.id,
+    )
+    replacement_answers = _answers_json(
+        QuestionsReplacementOrm,
+        AnswersReplacementOrm,
+        (
+            AnswersReplacementOrm.id,
+            AnswersReplacementOrm.text,
+            AnswersReplacementOrm.number_in_answer,
+        ),
+        AnswersReplacementOrm.number_in_answer,
+    )
+
+    branches = [
+        select(
+            literal(INPUT_STRING).label("type"),
+            QuestionsInputStringOrm.id.label("id"),
+            QuestionsInputStringOrm.question.label("question"),
+            QuestionsInputStringOrm.tag_id.label("tag_id"),
+            QuestionsInputStringOrm.answers.label("answer"),
+            cast(null(), JSON).label("answers"),
+        ).where(QuestionsInputStringOrm.test_id == test_id),
+        select(
+            literal(CHECK_BOX),
+            QuestionsCheckBoxOrm.id,
+            QuestionsCheckBoxOrm.question,
+            QuestionsCheckBoxOrm.tag_id,
+            cast(null(), Text),
+            checkbox_answers,
+        ).where(QuestionsCheckBoxOrm.test_id == test_id),
+        select(
+            literal(REPLACEMENT),
+            QuestionsReplacementOrm.id,
+            QuestionsReplacementOrm.question,
+            QuestionsReplacementOrm.tag_id,
+            cast(null(), Text),
+            replacement_answers,
+        ).where(QuestionsReplacementOrm.test_id == test_id),
+    ]
+    if picked is not None:
+        branches = [
+            branch.where(model.id.in_(_picked_ids(picked, question_type)))
+            for branch, (model, question_type) in zip(
+                branches, QUESTION_MODELS
+            )
+        ]
+    return union_all(*branches).subquery("pool")
+
+
+def build_payload_query(test_id, picked=None):
+    """Один SELECT: все вопросы теста вместе с ответами и тегами"""
+    pool = _questions_union(test_id, picked)
+    return select(
+        pool,
+        TagsOrm.name.label("tag_name"),
+        TagsOrm.count.label("tag_count"),
+    ).select_from(pool.outerjoin(TagsOrm, TagsOrm.id == pool.c.tag_id))
+
+
+def build_sample_keys_query(test_id):
+    """
+    Случайная выборка на стороне БД: по TagsOrm.count вопросов на тег.
+    Вопросы без тега или с count == 0 попадают в выборку целиком.
+    Только ключи (type, id) и теги — без HTML и ответов.
+    """
+    keys = union_all(
+        *(
+            select(
+                literal(question_type).label("type"),
+                model.id.label("id"),
+                model.tag_id.label("tag_id"),
+            ).where(model.test_id == test_id)
+            for model, question_type in QUESTION_MODELS
+        )
+    ).subquery("keys")
+
+    ranked = (
+        select(
+            keys.c.type,
+            keys.c.id,
+            keys.c.tag_id,
+            TagsOrm.name.label("tag_name"),
+            TagsOrm.count.label("tag_count"),
+            func.row_number()
+            .over(partition_by=keys.c.tag_id, order_by=func.random())
+            .label("rn"),
+        )
+        .select_from(keys.outerjoin(TagsOrm, TagsOrm.id == keys.c.tag_id))
+        .subquery("ranked")
+    )
+
+    return select(
+        ranked.c.type,
+        ranked.c.id,
+        ranked.c.tag_id,
+        ranked.c.tag_name,
+        ranked.c.tag_count,
+    ).where(
+        or_(
+            ranked.c.tag_count.is_(None),
+            ranked.c.tag_count <= 0,
+            ranked.c.rn <= ranked.c.tag_count,
+        )
+    )
+
+
+def build_summaries_query(test_id):
+    """
+    Список вопросов теста для редактора: тип, id, тег и краткий текст.
+    Порядок тот же, что у editor_entries.
+    """
+    pool = union_all(
+        *(
+            select(
+                literal(position).label("type_order"),
+                literal(question_type).label("type"),
+                model.id.label("id"),
+                model.tag_id.label("tag_id"),
+                model.summary.label("summary"),
+            ).where(model.test_id == test_id)
+            for position, (model, question_type) in enumerate(
+                QUESTION_MODELS
+            )
+        )
+    ).subquery("pool")
+    return (
+        select(
+            pool.c.type,
+            pool.c.id,
+            pool.c.summary,
+            TagsOrm.name.label("tag_name"),
+        )
+        .select_from(pool.outerjoin(TagsOrm, TagsOrm.id == pool.c.tag_id))
+        .order_by(pool.c.type_order, pool.c.id)
+    )
+
+
+def build_question_query(test_id, key):
+    """Один вопрос теста по ключу (type, id) вместе с ответами и тегом"""
+    question_type, question_id = key
+    picked = select(
+        literal(question_type).label("type"),
+        literal(question_id).label("id"),
+    ).cte("picked")
+    return build_payload_query(test_id, picked)
+
+
+def build_questions_query(test_id, keys):
+    """Вопросы теста по списку ключей (type, id) вместе с ответами"""
+    picked = values(
+        column("type", String), column("id", Integer), name="picked"
+    ).data(list(keys))
+    return build_payload_query(test_id, picked)
+
+
+def _to_answers(question_type, raw_answers):
+    if not raw_answers:
+        return ()
+    if question_type == CHECK_BOX:
+        return tuple(
+            AnswerRecord(id=a_id, text=a_text, is_correct=bool(is_correct))
+            for a_id, a_text, is_correct in raw_answers
+        )
+    return tuple(
+        AnswerRecord(id=a_id, text=a_text, number_in_answer=number)
+        for a_id, a_text, number in raw_answers
+    )
+
+
+def rows_to_payload(test_id, rows):
+    """Сборка TestPayload из строк результата build_payload_query"""
+    questions = []
+    tags = {}
+    for row in rows:
+        questions.append(
+            QuestionRecord(
+                id=row.id,
+                type=row.type,
+                question=row.question,
+                tag_id=row.tag_id,
+                tag_name=row.tag_name,
+                answer=row.answer,
+                answers=_to_answers(row.type, row.answers),
+            )
+        )
+        if row.tag_id is not None and row.tag_name is not None:
+            tags[row.tag_id] = TagRecord(
+                id=row.tag_id, name=row.tag_name, count=row.tag_count
+            )
+    return TestPayload(
+        test_id=test_id,
+        questions=tuple(questions),
+        tags=tuple(tags.values()),
+    )
+
+
+def editor_entries(payload):
+    """
+    Вопросы теста в формате QuestionEditor.questions:
+    [((type, id), (html, type_name, answer, tag)), ...]
+    """
+    type_order = {q_type: i for i, (_, q_type) in enumerate(QUESTION_MODELS)}
+    entries = []
+    for q in sorted(
+        payload.questions, key=lambda q: (type_order[q.type], q.id)
+    ):
+        if q.type == INPUT_STRING:
+            answer = q.answer
+        elif q.type == CHECK_BOX:
+            answer = [
+                [a.text for a in q.answers if a.is_correct],
+                [a.text for a in q.answers if not a.is_correct],
+            ]
+        else:
+            answer = [a.text for a in q.answers]
+
+        tag = q.tag_name if q.tag_name != NO_TAG else None
+        entries.append(
+            (
+                (q.type, q.id),
+                (q.question, EDITOR_TYPE_NAMES[q.type], answer, tag),
+            )
+        )
+    return entries
+
+
+def load_test_payload(session, test_id):
+    """Загрузка всего теста за один запрос к БД"""
+    rows = session.execute(build_payload_query(test_id)).all()
+    return rows_to_payload(test_id, rows)
+
+
+def load_question_summaries(session, test_id):
+    """Список вопросов для редактора без HTML — один лёгкий запрос"""
+    return [
+        QuestionSummary(
+            key=(row.type, row.id),
+            tag=row.tag_name if row.tag_name != NO_TAG else None,
+            summary=row.summary or "",
+        )
+        for row in session.execute(build_summaries_query(test_id))
+    ]
+
+
+def load_question_entry(session, test_id, key):
+    """
+    Вопрос в формате QuestionEditor (html, type_name, answer, tag)
+    или None, если вопроса уже нет.
+    """
+    rows = session.execute(build_question_query(test_id, key)).all()
+    entries = editor_entries(rows_to_payload(test_id, rows))
+    return entries[0][1] if entries else None
@@ -0,0 +1,304 @@
+# question_saver.py
+from html.parser import HTMLParser
+
+from models import (
+    AnswersCheckBoxOrm,
+    AnswersReplacementOrm,
+    QuestionsCheckBoxOrm,
+    QuestionsInputStringOrm,
+    QuestionsReplacementOrm,
+    TagsOrm,
+)
+from question_loader import (
+    CHECK_BOX,
+    EDITOR_TYPE_NAMES,
+    INPUT_STRING,
+    NO_TAG,
+    REPLACEMENT,
+)
+from sqlalchemy import delete, insert, select, update
+
+# Сколько строк отправлять в одном INSERT ... RETURNING
+BATCH_SIZE = 500
+
+# Названия типов в редакторе -> типы вопросов
+EDITOR_TYPES = {name: q_type for q_type, name in EDITOR_TYPE_NAMES.items()}
+
+QUESTION_MODELS = {
+    INPUT_STRING: QuestionsInputStringOrm,
+    CHECK_BOX: QuestionsCheckBoxOrm,
+    REPLACEMENT: QuestionsReplacementOrm,
+}
+
+# Длина краткого текста вопроса (summary) для списка в редакторе
+SUMMARY_LENGTH = 200
+
+
+class _PlainText(HTMLParser):
+    """Текст HTML вопроса без разметки и заголовка документа Qt"""
+
+    SKIPPED = {"head", "style", "script", "title"}
+    # границы абзацев и ячеек таблиц превращаются в пробелы
+    BLOCKS = {"br", "div", "li", "p", "table", "td", "th", "tr"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skipped = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self._skipped += 1
+        elif tag == "img":
+            self.parts.append(" [изображение] ")
+        elif tag in self.BLOCKS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self._skipped = max(self._skipped - 1, 0)
+        elif tag in self.BLOCKS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self._skipped:
+            self.parts.append(data)
+
+
+def question_summary(html, length=SUMMARY_LENGTH):
+    """Краткий текст вопроса: HTML без тегов, пробелы схлопнуты"""
+    parser = _PlainText()
+    parser.feed(html or "")
+    parser.close()
+    return " ".join("".join(parser.parts).split())[:length]
+
+
+def insert_returning_ids(session, model, rows, batch_size=BATCH_SIZE):
+    """INSERT ... RETURNING id пачками, id возвращаются в порядке rows"""
+    ids = []
+    for start in range(0, len(rows), batch_size):
+        result = session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            rows[start : start + batch_size],
+        )
+        ids.extend(result.scalars().all())
+    return ids
+
+
+def insert_tags(session, test_id, tag_counts):
+    """Сохранение тегов теста, возвращает {tag_name: tag_id}"""
+    names = list(tag_counts)
+    ids = insert_returning_ids(
+        session,
+        TagsOrm,
+        [
+            {"name": name, "count": tag_counts[name], "test_id": test_id}
+            for name in names
+        ],
+    )
+    return dict(zip(names, ids))
+
+
+def checkbox_answer_rows(question_id, answer):
+    right, wrong = answer
+    return [
+        {"text": text, "is_correct": True, "question_id": question_id}
+        for text in right
+    ] + [
+        {"text": text, "is_correct": False, "question_id": question_id}
+        for text in wrong
+    ]
+
+
+def replacement_answer_rows(question_id, answer):
+    return [
+        {"text": text, "number_in_answer": i, "question_id": question_id}
+        for i, text in enumerate(answer, 1)
+    ]
+
+
+def insert_questions(session, test_id, questions, tag_ids):
+    """
+    Массовое сохранение вопросов редактора [(html, type, answer, tag), ...].
+    Вопросы — один INSERT ... RETURNING на тип (пачками по BATCH_SIZE),
+    ответы — один executemany на таблицу ответов.
+    Возвращает id вставленных вопросов в порядке questions.
+    """
+    by_type = {INPUT_STRING: [], CHECK_BOX: [], REPLACEMENT: []}
+    for position, (q_html, q_type, q_answer, q_tag) in enumerate(questions):
+        by_type[EDITOR_TYPES[q_type]].append(
+            (position, q_html, q_answer, tag_ids.get(q_tag or NO_TAG))
+        )
+
+    question_ids = [None] * len(questions)
+    checkbox_answers = []
+    replacement_answers = []
+
+    for q_type, items in by_type.items():
+        if not items:
+            continue
+
+        rows = []
+        for _, q_html, q_answer, tag_id in items:
+            row = {
+                "test_id": test_id,
+                "question": q_html,
+                "summary": question_summary(q_html),
+                "tag_id": tag_id,
+            }
+            if q_type == INPUT_STRING:
+                row["answers"] = q_answer
+            rows.append(row)
+
+        ids = insert_returning_ids(session, QUESTION_MODELS[q_type], rows)
+
+        for (position, _, q_answer, _), question_id in zip(items, ids):
+            question_ids[position] = question_id
+            if q_type == CHECK_BOX:
+                checkbox_answers += checkbox_answer_rows(question_id, q_answer)
+            elif q_type == REPLACEMENT:
+                replacement_answers += replacement_answer_rows(
+                    question_id, q_answer
+                )
+
+    if checkbox_answers:
+        session.execute(insert(AnswersCheckBoxOrm), checkbox_answers)
+    if replacement_answers:
+        session.execute(insert(AnswersReplacementOrm), replacement_answers)
+
+    return question_ids
+
+
+def save_tags(session, test_id, tag_counts):
+    """
+    Синхронизация тегов теста с tag_counts без пересоздания:
+    меняется count у существующих, добавляются новые, удаляются лишние.
+    Возвращает {tag_name: tag_id}.
+    """
+    existing = {
+        row.name: row
+        for row in session.execute(
+            select(TagsOrm.id, TagsOrm.name, TagsOrm.count).where(
+                TagsOrm.test_id == test_id
+            )
+        )
+    }
+
+    changed = [
+        {"id": existing[name].id, "count": count}
+        for name, count in tag_counts.items()
+        if name in existing and existing[name].count != count
+    ]
+    if changed:
+        session.execute(update(TagsOrm), changed)
+
+    removed = [
+        row.id for name, row in existing.items() if name not in tag_counts
+    ]
+    if removed:
+        session.execute(delete(TagsOrm).where(TagsOrm.id.in_(removed)))
+
+    tag_ids = {
+        name: row.id for name, row in existing.items() if name in tag_counts
+    }
+    tag_ids.update(
+        insert_tags(
+            session,
+            test_id,
+            {
+                name: count
+                for name, count in tag_counts.items()
+                if name not in existing
+            },
+        )
+    )
+    return tag_ids
+
+
+def _delete_questions(session, keys):
+    """Удаление вопросов по ключам (type, id); ответы удалит CASCADE"""
+    by_type = {}
+    for q_type, question_id in keys:
+        by_type.setdefault(q_type, []).append(question_id)
+    for q_type, ids in by_type.items():
+        model = QUESTION_MODELS[q_type]
+        session.execute(delete(model).where(model.id.in_(ids)))
+
+
+def update_questions(
+    session, test_id, questions, keys, originals, tag_ids, deleted=()
+):
+    """
+    Сохранение только изменений отредактированного теста.
+    questions — новые и открытые в редакторе вопросы (остальные не
+    загружались и не менялись), keys — ключ (type, id) в БД для каждого
+    из них (None для новых), originals — {key: вопрос в момент загрузки},
+    deleted — ключи удалённых вопросов.
+    """
+    new_questions = []
+    deleted = set(deleted)
+    question_rows = {INPUT_STRING: [], CHECK_BOX: [], REPLACEMENT: []}
+    replaced_answers = {CHECK_BOX: [], REPLACEMENT: []}
+    checkbox_answers = []
+    replacement_answers = []
+
+    for entry, key in zip(questions, keys):
+        q_html, q_type, q_answer, q_tag = entry
+        q_type = EDITOR_TYPES[q_type]
+
+        if key is None:
+            new_questions.append(entry)
+            continue
+
+        original = originals[key]
+        if entry == original:
+            continue
+
+        old_type, question_id = key
+        if old_type != q_type:
+            # Сменился тип вопроса — это другая таблица
+            deleted.add(key)
+            new_questions.append(entry)
+            continue
+
+        row = {
+            "id": question_id,
+            "question": q_html,
+            "summary": question_summary(q_html),
+            "tag_id": tag_ids.get(q_tag or NO_TAG),
+        }
+        if q_type == INPUT_STRING:
+            row["answers"] = q_answer
+        question_rows[q_type].append(row)
+
+        if q_type != INPUT_STRING and q_answer != original[2]:
+            replaced_answers[q_type].append(question_id)
+            if q_type == CHECK_BOX:
+                checkbox_answers += checkbox_answer_rows(question_id, q_answer)
+            else:
+                replacement_answers += replacement_answer_rows(
+                    question_id, q_answer
+                )
+
+    if deleted:
+        _delete_questions(session, deleted)
+
+    for q_type, rows in question_rows.items():
+        if rows:
+            session.execute(update(QUESTION_MODELS[q_type]), rows)
+
+    for answer_model, q_type, rows in (
+        (AnswersCheckBoxOrm, CHECK_BOX, checkbox_answers),
+        (AnswersReplacementOrm, REPLACEMENT, replacement_answers),
+    ):
+        if replaced_answers[q_type]:
+            session.execute(
+                delete(answer_model).where(
+                    answer_model.question_id.in_(replaced_answers[q_type])
+                )
+            )
+        if rows:
+            session.execute(insert(answer_model), rows)
+
+    if new_questions:
+        insert_questions(session, test_id, new_questions, tag_ids)
@@ -0,0 +1,362 @@
+# repository.py
+import asyncio
+
+from auth import GENERATED_PASSWORD_ITERATIONS, hash_passwords, is_hashed
+from credential_export import (
+    export_groups,
+    group_students_for_reset,
+    reset_passwords,
+    write_credentials,
+)
+from database import get_async_session
+from image_store import fetch_images, image_cache, save_images
+from models import GroupsOrm, StudentsOrm, TeachersOrm, TestsOrm
+from payload_cache import payload_cache
+from question_loader import (
+    TagRecord,
+    TestPayload,
+    build_questions_query,
+    build_sample_keys_query,
+    load_question_entry,
+    load_question_summaries,
+    rows_to_payload,
+)
+from question_saver import (
+    insert_questions,
+    insert_tags,
+    save_tags,
+    update_questions,
+)
+from sqlalchemy import select
+from student_import import (
+    generate_password,
+    import_students,
+    read_students,
+    unique_credentials,
+)
+
+# Асинхронный доступ к данным для окон приложения: запросы идут через
+# asyncpg и не блокируют цикл событий Qt (qasync). Синхронные функции
+# загрузки/сохранения выполняются через AsyncSession.run_sync.
+
+DEFAULT_TEACHER_LOGIN = "teacher_admin"
+DEFAULT_TEACHER_PASSWORD = "123"
+
+
+async def ensure_default_teacher():
+    """Создание учителя по умолчанию, возвращает True, если он создан"""
+    async with get_async_session() as session:
+        existing_teacher = await session.scalar(
+            select(TeachersOrm.id).where(
+                TeachersOrm.login == DEFAULT_TEACHER_LOGIN
+            )
+        )
+        if existing_teacher:
+            return False
+
+    (stored,) = await hash_passwords([DEFAULT_TEACHER_PASSWORD])
+    async with get_async_session() as session:
+        session.add(TeachersOrm(login=DEFAULT_TEACHER_LOGIN, password=stored))
+        await session.commit()
+        return True
+
+
+async def list_tests():
+    """[(id, name_test, teacher), ...]"""
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(TestsOrm.id, TestsOrm.name_test, TestsOrm.teacher).order_by(
+                TestsOrm.id
+            )
+        )
+        return result.all()
+
+
+async def get_test_info(test_id):
+    """(name_test, teacher) теста"""
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(TestsOrm.name_test, TestsOrm.teacher).where(
+                TestsOrm.id == test_id
+            )
+        )
+        return result.one()
+
+
+async def test_name_exists(name_test):
+    async with get_async_session() as session:
+        return bool(
+            await session.scalar(
+                select(
+                    select(TestsOrm.id)
+                    .where(TestsOrm.name_test == name_test)
+                    .exists()
+                )
+            )
+        )
+
+
+def _save_test(
+    session,
+    test_id,
+    name_test,
+    teacher,
+    tag_counts,
+    questions,
+    keys,
+    originals,
+    deleted,
+):
+    """Сохранение теста в одной транзакции -> (test_id, хэши изображений)"""
+    if test_id:
+        # Обновляем информацию о тесте
+        test = session.get(TestsOrm, test_id)
+        test.name_test = name_test
+        test.teacher = teacher
+        test.version = TestsOrm.version + 1
+        session.flush()
+
+        # Сохраняем только изменения: новые, изменённые и удалённые
+        tag_ids = save_tags(session, test_id, tag_counts)
+        update_questions(
+            session, test_id, questions, keys, originals, tag_ids, deleted
+        )
+    else:
+        # Создаем новый тест
+        new_test = TestsOrm(name_test=name_test, teacher=teacher)
+        session.add(new_test)
+        session.flush()  # Чтобы получить id теста
+        test_id = new_test.id
+
+        # --- Сохраняем теги и вопросы пачками ---
+        tag_ids = insert_tags(session, test_id, tag_counts)
+        insert_questions(session, test_id, questions, tag_ids)
+
+    # Новые изображения вопросов — в общее хранилище
+    stored_images = save_images(session, [q[0] for q in questions])
+    return test_id, stored_images
+
+
+async def save_test(
+    test_id,
+    name_test,
+    teacher,
+    tag_counts,
+    questions,
+    keys,
+    originals,
+    deleted=(),
+):
+    """
+    Сохранение нового (test_id=None) или отредактированного теста.
+    Для редактируемого теста questions — только новые и открытые в
+    редакторе вопросы, deleted — ключи (type, id) удалённых.
+    """
+    async with get_async_session() as session:
+        test_id, stored_images = await session.run_sync(
+            _save_test,
+            test_id,
+            name_test,
+            teacher,
+            tag_counts,
+            questions,
+            keys,
+            originals,
+            deleted,
+        )
+        await session.commit()
+
+    image_cache.mark_stored(stored_images)
+    # Старые версии теста в кэше больше не нужны
+    payload_cache.invalidate(test_id)
+    return test_id
+
+
+async def load_editor_summaries(test_id):
+    """Список вопросов теста для редактора: ключ, тег и краткий текст"""
+    async with get_async_session() as session:
+        return await session.run_sync(load_question_summaries, test_id)
+
+
+def _load_entry_with_images(session, test_id, key):
+    entry = load_question_entry(session, test_id, key)
+    if entry is not None:
+        fetch_images(session, [entry[0]])
+    return entry
+
+
+async def load_editor_question(test_id, key):
+    """Открываемый в редакторе вопрос целиком вместе с изображениями"""
+    async with get_async_session() as session:
+        return await session.run_sync(_load_entry_with_images, test_id, key)
+
+
+def _load_exam_sample(session, test_id):
+    """
+    Версия теста, выборка ключей в БД и недостающие в кэше вопросы —
+    в одной транзакции REPEATABLE READ, то есть из одного снимка данных:
+    вопросы попадают в кэш под той версией, с которой они прочитаны.
+    """
+    session.connection(
+        execution_options={"isolation_level": "REPEATABLE READ"}
+    )
+    version = session.scalar(
+        select(TestsOrm.version).where(TestsOrm.id == test_id)
+    )
+    picked = session.execute(build_sample_keys_query(test_id)).all()
+    keys = [(row.type, row.id) for row in picked]
+
+    questions = payload_cache.get_questions(test_id, version, keys)
+    missing = [key for key in keys if key not in questions]
+    if missing:
+        rows = session.execute(build_questions_query(test_id, missing)).all()
+        loaded = rows_to_payload(test_id, rows).questions
+        payload_cache.put_questions(test_id, version, loaded)
+        questions.update(((q.type, q.id), q) for q in loaded)
+
+    tags = {
+        row.tag_id: TagRecord(
+            id=row.tag_id, name=row.tag_name, count=row.tag_count
+        )
+        for row in picked
+        if row.tag_id is not None and row.tag_name is not None
+    }
+    payload = TestPayload(
+        test_id=test_id,
+        questions=tuple(questions[key] for key in keys if key in questions),
+        tags=tuple(tags.values()),
+    )
+    fetch_images(session, [q.question for q in payload.questions])
+    return version, payload
+
+
+async def load_exam_payload(test_id):
+    """
+    Выборка вопросов для студента -> (версия теста, TestPayload).
+    Выборку (TagsOrm.count вопросов на тег) всегда делает БД, из кэша
+    берутся уже загруженные вопросы той же версии теста.
+    """
+    async with get_async_session() as session:
+        return await session.run_sync(_load_exam_sample, test_id)
+
+
+async def list_groups():
+    """[(id, name), ...]"""
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(GroupsOrm.id, GroupsOrm.name).order_by(GroupsOrm.name)
+        )
+        return result.all()
+
+
+def group_students_query(group_id):
+    """Студенты группы с названием группы — по индексу group_id"""
+    return (
+        select(
+            StudentsOrm.login,
+            StudentsOrm.password,
+            StudentsOrm.full_name,
+            GroupsOrm.name.label("group_name"),
+        )
+        .join(GroupsOrm, GroupsOrm.id == StudentsOrm.group_id)
+        .where(StudentsOrm.group_id == group_id)
+        .order_by(StudentsOrm.full_name)
+    )
+
+
+async def group_students(group_id):
+    """Студенты группы для предпросмотра (одним запросом)"""
+    async with get_async_session() as session:
+        result = await session.execute(group_students_query(group_id))
+        students = [dict(row) for row in result.mappings()]
+
+    # Хэш пароля показывать бессмысленно
+    for student in students:
+        if is_hashed(student["password"]):
+            student["password"] = None
+    return students
+
+
+async def import_students_file(file_path, credentials_path):
+    """
+    Импорт студентов из Excel. Чтение файла (pandas) и хэширование
+    паролей идут в потоках, запись в БД — одной транзакцией. Пароли
+    в открытом виде существуют только здесь: они записываются в
+    credentials_path, и студенты сохраняются, только если файл записан.
+    Возвращает (строки файла, добавленные студенты с паролями).
+    """
+    loop = asyncio.get_running_loop()
+    rows = await loop.run_in_executor(None, read_students, file_path)
+    if not rows:
+        return rows, []
+
+    async with get_async_session() as session:
+        credentials = await session.run_sync(unique_credentials, len(rows))
+    stored = await hash_passwords(
+        [password for _, password in credentials],
+        GENERATED_PASSWORD_ITERATIONS,
+    )
+
+    async with get_async_session() as session:
+        added_students = await session.run_sync(
+            import_students,
+            rows,
+            [
+                (login, password, stored_password)
+                for (login, password), stored_password in zip(
+                    credentials, stored
+                )
+            ],
+        )
+        await loop.run_in_executor(
+            None, write_credentials, credentials_path, added_students
+        )
+        await session.commit()
+    return rows, added_students
+
+
+async def export_credentials(file_path, group_ids):
+    """
+    Экспорт логинов групп в Excel (учётные данные не меняются),
+    возвращает число студентов
+    """
+    async with get_async_session() as session:
+        return await session.run_sync(export_groups, file_path, group_ids)
+
+
+async def reset_group_passwords(file_path, group_ids):
+    """
+    Новые пароли всем студентам групп: прежние перестают действовать.
+    Пароли записываются в file_path и вступают в силу, только если файл
+    записан. Возвращает число студентов.
+    """
+    async with get_async_session() as session:
+        students = await session.run_sync(group_students_for_reset, group_ids)
+    if not students:
+        return 0
+
+    passwords = [generate_password() for _ in students]
+    stored = await hash_passwords(passwords, GENERATED_PASSWORD_ITERATIONS)
+
+    loop = asyncio.get_running_loop()
+    async with get_async_session() as session:
+        await session.run_sync(
+            reset_passwords,
+            {student.id: hashed for student, hashed in zip(students, stored)},
+        )
+        written = await loop.run_in_executor(
+            None,
+            write_credentials,
+            file_path,
+            [
+                {
+                    "login": student.login,
+                    "password": password,
+                    "full_name": student.full_name,
+                    "group_name": student.name,
+                }
+                for student, password in zip(students, passwords)
+            ],
+        )
+        await session.commit()
+    return written
@@ -0,0 +1,119 @@
+# student_import.py
+import secrets
+import string
+
+from models import GroupsOrm, StudentsOrm
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+REQUIRED_COLUMNS = ['ФИО', 'Группа']
+
+CREDENTIAL_CHARS = string.ascii_letters + string.digits
+
+
+def generate_password():
+    """Пароль из 8 случайных символов"""
+    return ''.join(secrets.choice(CREDENTIAL_CHARS) for _ in range(8))
+
+
+def generate_credentials():
+    """Генерация логина и пароля из 8 случайных символов"""
+    login = ''.join(secrets.choice(CREDENTIAL_CHARS) for _ in range(8))
+    return login, generate_password()
+
+
+def read_students(file_path):
+    """Чтение листа Excel: [(ФИО, группа), ...] без пустых строк"""
+    import pandas as pd
+
+    df = pd.read_excel(file_path, dtype=str)
+    if not all(col in df.columns for col in REQUIRED_COLUMNS):
+        raise ValueError(
+            f"Файл должен содержать колонки: {', '.join(REQUIRED_COLUMNS)}"
+        )
+
+    df = df[REQUIRED_COLUMNS].dropna()
+    rows = []
+    for full_name, group_name in df.itertuples(index=False, name=None):
+        full_name, group_name = full_name.strip(), group_name.strip()
+        if full_name and group_name:
+            rows.append((full_name, group_name))
+    return rows
+
+
+def upsert_groups(session, group_names):
+    """Все группы одним INSERT ... ON CONFLICT, возвращает {name: id}"""
+    if not group_names:
+        return {}
+    stmt = pg_insert(GroupsOrm).values([{"name": n} for n in group_names])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GroupsOrm.name],
+        set_={"name": stmt.excluded.name},
+    ).returning(GroupsOrm.id, GroupsOrm.name)
+    return {name: group_id for group_id, name in session.execute(stmt)}
+
+
+def unique_credentials(session, count):
+    """
+    count пар (логин, пароль): логины уникальны между собой,
+    занятость в БД проверяется одним запросом на раунд генерации
+    """
+    credentials = {}
+    while len(credentials) < count:
+        batch = {}
+        while len(credentials) + len(batch) < count:
+            login, password = generate_credentials()
+            if login not in credentials:
+                batch[login] = password
+
+        taken = set(
+            session.scalars(
+                select(StudentsOrm.login).where(StudentsOrm.login.in_(batch))
+            )
+        )
+        for login, password in batch.items():
+            if login not in taken:
+                credentials[login] = password
+    return list(credentials.items())
+
+
+def import_students(session, rows, credentials):
+    """
+    Импорт студентов [(ФИО, группа), ...] с учётными данными
+    [(логин, пароль, хэш пароля), ...] из unique_credentials:
+    группы — один upsert, студенты — одна массовая вставка.
+    В БД сохраняется только хэш; данные добавленных студентов
+    (с паролем) возвращаются для предпросмотра.
+    Коммит делает вызывающий код.
+    """
+    if not rows:
+        return []
+
+    group_ids = upsert_groups(
+        session, sorted({group_name for _, group_name in rows})
+    )
+
+    added_students = []
+    student_rows = []
+    for (full_name, group_name), (login, password, stored) in zip(
+        rows, credentials
+    ):
+        student_rows.append(
+            {
+                "login": login,
+                "password": stored,
+                "full_name": full_name,
+                "group_id": group_ids[group_name],
+            }
+        )
+        added_students.append(
+            {
+                "login": login,
+                "password": password,
+                "full_name": full_name,
+                "group_name": group_name,
+            }
+        )
+
+    session.execute(insert(StudentsOrm), student_rows)
+    return added_students